@@ -0,0 +1,98 @@
+"""Micro-benchmark for the per-request cost of the answer chain.
+
+Compares composing the LCEL chain on every request (the old code path) with
+RAGService's prebuilt chain, using a fake chat model so only LangChain
+overhead is measured. The default single-token answer keeps per-token
+streaming cost, which both paths share, out of the numbers. Runs without
+credentials:
+
+    python -m benchmarks.bench_chain --iterations 500
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from itertools import repeat
+
+# RAGService requires an API key; nothing here talks to OpenAI or Pinecone.
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("VECTOR_BACKEND", "local")
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+
+from services.rag_service import RAGService  # noqa: E402
+
+
+def _service(answer: str) -> RAGService:
+    service = RAGService(namespaces=["benchmark"])
+    service.llm = GenericFakeChatModel(messages=repeat(AIMessage(content=answer)))
+    service.chain = service._build_chain()
+    return service
+
+
+def _docs(count: int, size: int):
+    return [
+        Document(page_content="x" * size, metadata={"source_namespace": "benchmark"})
+        for _ in range(count)
+    ]
+
+
+async def _per_request(service: RAGService, docs, question: str) -> str:
+    chain = (
+        {
+            "context": lambda x: service._format_docs(docs),
+            "question": lambda x: question,
+        }
+        | service.prompt
+        | service.llm
+        | service.parser
+    )
+    return "".join([chunk async for chunk in chain.astream({})])
+
+
+async def _prebuilt(service: RAGService, docs, question: str) -> str:
+    chunks = service.chain.astream({"docs": docs, "question": question})
+    return "".join([chunk async for chunk in chunks])
+
+
+async def _time(fn, iterations: int, *args) -> float:
+    for _ in range(min(20, iterations)):
+        await fn(*args)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await fn(*args)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def main_async(args):
+    service = _service(" ".join(["token"] * args.tokens))
+    docs = _docs(args.docs, args.doc_chars)
+    question = "What does TCP's three-way handshake establish?"
+
+    per_request = await _time(_per_request, args.iterations, service, docs, question)
+    prebuilt = await _time(_prebuilt, args.iterations, service, docs, question)
+    build_start = time.perf_counter()
+    for _ in range(args.iterations):
+        service._build_chain()
+    build = (time.perf_counter() - build_start) / args.iterations * 1e6
+
+    print(f"chain composition only : {build:9.1f} us/request")
+    print(f"per-request chain      : {per_request:9.1f} us/request")
+    print(f"prebuilt chain         : {prebuilt:9.1f} us/request")
+    print(f"saved                  : {per_request - prebuilt:9.1f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark answer-chain overhead.")
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--docs", type=int, default=5)
+    parser.add_argument("--doc-chars", type=int, default=1000)
+    parser.add_argument("--tokens", type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
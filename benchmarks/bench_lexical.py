@@ -0,0 +1,51 @@
+"""Micro-benchmark for BM25 search over the CSR postings.
+
+Builds a synthetic corpus of random terms and times multi-term queries, so
+the number is the cost of the posting-list multiply-adds and the top-k
+selection. Runs without credentials:
+
+    python -m benchmarks.bench_lexical --docs 20000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from services.lexical_index import LexicalIndex
+
+
+def _corpus(docs: int, vocabulary: int, length: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    terms = [f"term{i}" for i in range(vocabulary)]
+    return [" ".join(rng.choice(terms, size=length)) for _ in range(docs)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BM25 lexical search.")
+    parser.add_argument("--docs", type=int, default=10_000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--doc-terms", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    texts = _corpus(args.docs, args.vocabulary, args.doc_terms)
+    index = LexicalIndex()
+    index.add([str(i) for i in range(len(texts))], texts, [{}] * len(texts))
+    build_start = time.perf_counter()
+    index.search("term1", k=args.k)  # builds the postings
+    build = time.perf_counter() - build_start
+
+    query = "term1 term42 term999"
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        index.search(query, k=args.k)
+    per_query = (time.perf_counter() - start) / args.iterations * 1e3
+
+    print(f"postings build : {build * 1e3:9.1f} ms ({args.docs} docs)")
+    print(f"search         : {per_query:9.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Micro-benchmark for maximal marginal relevance re-ranking.
+
+Times picking ``k`` of ``fetch_k`` random candidate embeddings, which is the
+per-request cost MMR adds on top of the vector search. Runs without
+credentials:
+
+    python -m benchmarks.bench_mmr --fetch-k 50 --k 5
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from services.mmr import maximal_marginal_relevance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MMR re-ranking.")
+    parser.add_argument("--fetch-k", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=args.dim).astype(np.float32)
+    candidates = rng.normal(size=(args.fetch_k, args.dim)).astype(np.float32)
+    for _ in range(min(20, args.iterations)):
+        maximal_marginal_relevance(query, candidates, args.k, args.lambda_mult)
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        maximal_marginal_relevance(query, candidates, args.k, args.lambda_mult)
+    per_call = (time.perf_counter() - start) / args.iterations * 1e6
+    print(f"mmr k={args.k} of {args.fetch_k} (dim {args.dim}) : {per_call:9.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
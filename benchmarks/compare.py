@@ -0,0 +1,50 @@
+"""Compare two load-test result files.
+
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+
+import argparse
+import json
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+def _flatten(results: Dict, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{name}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def compare(baseline: Dict, candidate: Dict) -> List[Tuple[str, float, float, Optional[float]]]:
+    """Rows of (metric, baseline, candidate, percent change)."""
+    before = dict(_flatten(baseline["results"]))
+    rows = []
+    for name, after in _flatten(candidate["results"]):
+        if name not in before:
+            continue
+        change = (after - before[name]) / before[name] * 100 if before[name] else None
+        rows.append((name, before[name], after, change))
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare two load-test result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, "r", encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    print(f"{'metric':<24} {baseline.get('commit') or 'baseline':>12} {candidate.get('commit') or 'candidate':>12}  change")
+    for name, before, after, change in compare(baseline, candidate):
+        delta = f"{change:+.1f}%" if change is not None else "n/a"
+        print(f"{name:<24} {before:>12g} {after:>12g}  {delta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Deterministic local stand-ins for OpenAI and Pinecone.
+
+Used by the benchmark harness so the request path can be exercised and timed
+without credentials or network access.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import xxhash
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from services.local_index import LocalVectorIndex
+
+
+class FakeEmbeddings(Embeddings):
+    """Unit vectors seeded from a hash of the text, with optional call latency.
+
+    The same text always maps to the same vector, so the embedding and
+    semantic caches behave as they would with a real model.
+    """
+
+    def __init__(self, dim: int, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+
+    def _vector(self, text: str) -> List[float]:
+        rng = np.random.default_rng(xxhash.xxh3_64_intdigest(text.strip()))
+        vector = rng.standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Chat model that streams ``answer_tokens`` tokens at a fixed pace.
+
+    The first token arrives after ``ttft`` seconds and the rest at
+    ``tokens_per_second``, so time-to-first-token and generation throughput
+    can be set per benchmark run.
+    """
+
+    ttft: float = 0.2
+    tokens_per_second: float = 50.0
+    answer_tokens: int = 64
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming-chat"
+
+    def _tokens(self) -> List[str]:
+        return [f"token{i} " for i in range(self.answer_tokens)]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.ttft + max(0, self.answer_tokens - 1) / self.tokens_per_second)
+        message = AIMessage(content="".join(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.ttft)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.ttft)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def build_corpus_index(
+    embeddings: FakeEmbeddings, namespace: str, size: int, chunk_chars: int = 800
+) -> LocalVectorIndex:
+    """An in-memory index of ``size`` synthetic chunks, standing in for Pinecone."""
+    texts = [
+        f"{namespace} chunk {i}: " + (f"networking topic {i % 97} " * (chunk_chars // 24))
+        for i in range(size)
+    ]
+    index = LocalVectorIndex(embeddings.dim)
+    index.add(
+        ids=[f"{namespace}-{i}" for i in range(size)],
+        vectors=embeddings.embed_documents(texts),
+        texts=texts,
+        metadatas=[{"page": i} for i in range(size)],
+    )
+    return index
+
+
+def install_fakes(
+    service,
+    embeddings: FakeEmbeddings,
+    llm: FakeStreamingChatModel,
+    corpus: Dict[str, LocalVectorIndex],
+):
+    """Swap a RAGService's external clients for the local stand-ins."""
+    service.embeddings = embeddings
+    service.retriever.embeddings = embeddings
+    service.retriever.vectorstores = dict(corpus)
+    service.llm = llm
+    service.chain = service._build_chain()
+
+
+def questions(count: int) -> Sequence[str]:
+    return [f"How does protocol number {i} handle congestion?" for i in range(count)]
@@ -0,0 +1,197 @@
+"""Offline load test of the real FastAPI app against local stand-ins.
+
+Drives /query or /ask in-process through httpx's ASGI transport, with
+FakeEmbeddings, FakeStreamingChatModel and in-memory indexes in place of
+OpenAI and Pinecone, and writes throughput, latency percentiles, TTFT and
+memory to a JSON file:
+
+    python -m benchmarks.load_test --endpoint ask --requests 500 --concurrency 32
+    python -m benchmarks.compare benchmarks/results/a.json benchmarks/results/b.json
+
+Settings such as CACHE_BACKEND or RATE_LIMIT_BACKEND are read from the
+environment as usual, so their effect can be compared between runs.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import resource
+import subprocess
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+# The service requires an API key, and the default rate limit would reject
+# most of the run; neither matters for an offline benchmark.
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("VECTOR_BACKEND", "local")
+os.environ.setdefault("LOCAL_INDEX_DIR", os.path.join("benchmarks", "results", "empty-index"))
+os.environ.setdefault("RATE_LIMIT_REQUESTS", "1000000000")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+from benchmarks.fakes import (  # noqa: E402
+    FakeEmbeddings,
+    FakeStreamingChatModel,
+    build_corpus_index,
+    install_fakes,
+    questions,
+)
+from config.settings import settings  # noqa: E402
+
+
+def _summary(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    data = np.asarray(values)
+    return {
+        "mean": round(float(data.mean()), 2),
+        "p50": round(float(np.percentile(data, 50)), 2),
+        "p95": round(float(np.percentile(data, 95)), 2),
+        "p99": round(float(np.percentile(data, 99)), 2),
+        "max": round(float(data.max()), 2),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+async def _one_request(client: httpx.AsyncClient, endpoint: str, question: str) -> Dict:
+    started = time.perf_counter()
+    if endpoint == "query":
+        resp = await client.post("/query", json={"query": question})
+        return {
+            "ok": resp.status_code == 200,
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "ttft_ms": None,
+        }
+
+    # The ASGI transport buffers the body, so TTFT comes from the server-side
+    # timings on the NDJSON events rather than from the client clock.
+    resp = await client.post("/ask", json={"query": question, "stream_format": "ndjson"})
+    ttft_ms = None
+    for line in resp.text.splitlines():
+        event = json.loads(line)
+        if "ttft_ms" in event:
+            ttft_ms = event["ttft_ms"]
+            break
+    return {
+        "ok": resp.status_code == 200,
+        "latency_ms": (time.perf_counter() - started) * 1000,
+        "ttft_ms": ttft_ms,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    import main
+
+    embeddings = FakeEmbeddings(settings.EMBEDDING_DIM, latency=args.embed_latency)
+    llm = FakeStreamingChatModel(
+        ttft=args.ttft, tokens_per_second=args.tokens_per_second, answer_tokens=args.answer_tokens
+    )
+    corpus = {
+        ns: build_corpus_index(embeddings, ns, args.corpus_size) for ns in main.NAMESPACES
+    }
+    install_fakes(await main.get_rag_service(), embeddings, llm, corpus)
+    pool = questions(args.distinct_questions)
+
+    if args.trace_memory:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    results: List[Dict] = []
+    next_index = 0
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal next_index
+        while next_index < args.requests:
+            i = next_index
+            next_index += 1
+            results.append(await _one_request(client, args.endpoint, pool[i % len(pool)]))
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        duration = time.perf_counter() - started
+
+    memory = {"max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    memory["rss_growth_kib"] = memory["max_rss_kib"] - rss_before
+    if args.trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        in_flight = min(args.concurrency, args.requests)
+        memory["peak_traced_kib"] = round((peak - baseline) / 1024, 1)
+        memory["per_request_kib"] = round((peak - baseline) / 1024 / in_flight, 1)
+
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    config["cache_backend"] = settings.CACHE_BACKEND
+    config["rate_limit_backend"] = settings.RATE_LIMIT_BACKEND
+
+    ok = [r for r in results if r["ok"]]
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "config": config,
+        "results": {
+            "requests": len(results),
+            "errors": len(results) - len(ok),
+            "duration_s": round(duration, 3),
+            "throughput_rps": round(len(ok) / duration, 2) if duration else None,
+            "latency_ms": _summary([r["latency_ms"] for r in ok]),
+            "ttft_ms": _summary([r["ttft_ms"] for r in ok if r["ttft_ms"] is not None]),
+            "memory": memory,
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description="Load-test the RAG API with local stand-ins.")
+    parser.add_argument("--endpoint", choices=["query", "ask"], default="query")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--distinct-questions",
+        type=int,
+        default=50,
+        help="Size of the question pool; fewer than --requests exercises the caches",
+    )
+    parser.add_argument("--corpus-size", type=int, default=2000, help="Chunks per namespace")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Seconds per embeddings call")
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds to the first LLM token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    parser.add_argument("--trace-memory", action="store_true", help="Measure with tracemalloc (slower)")
+    parser.add_argument("--output", default=None, help="JSON path (default: benchmarks/results/...)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    output = args.output or os.path.join(
+        "benchmarks",
+        "results",
+        f"{args.endpoint}-{report['commit'] or 'nocommit'}-{int(time.time())}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    results = report["results"]
+    print(json.dumps(results, indent=2))
+    print(f"Wrote {output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
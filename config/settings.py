@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import List, Optional
 
 from pydantic import model_validator
@@ -5,60 +6,11 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
-    """Application configuration loaded from environment variables."""
-
-    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, extra="ignore")
-
-    # API
-    HOST: str = "0.0.0.0"
-    PORT: int = 8000
-    DEBUG: bool = False
-
-    # CORS
-    CORS_ORIGINS: List[str] = ["*"]
-
-    # Pinecone
-    PINECONE_API_KEY: str
-    PINECONE_INDEX_NAME: str
-    PINECONE_ENVIRONMENT: Optional[str] = None
-    PINECONE_ENV: Optional[str] = None  # backward compat
-
-    # OpenAI/LLM
-    OPENAI_API_KEY: str
-    LLM_MODEL: str = "gpt-3.5-turbo"
-    EMBEDDING_MODEL: str = "text-embedding-3-small"
-    EMBEDDING_DIM: int = 1024
-
-    # Optional extras (ignored if not set)
-    GOOGLE_API_KEY: Optional[str] = None
-    FIREBASE_CREDS: Optional[str] = None
-
-    # Rate limiting
-    RATE_LIMIT_REQUESTS: int = 100
-    RATE_LIMIT_WINDOW: int = 60  # seconds
-
-    # Logging
-    LOG_LEVEL: str = "INFO"
-
-    @model_validator(mode="after")
-    def populate_env_from_alias(self):
-        # Allow PINECONE_ENV as alias for PINECONE_ENVIRONMENT
-        if not self.PINECONE_ENVIRONMENT and self.PINECONE_ENV:
-            self.PINECONE_ENVIRONMENT = self.PINECONE_ENV
-        if not self.PINECONE_ENVIRONMENT:
-            raise ValueError("PINECONE_ENVIRONMENT (or PINECONE_ENV) is required")
-        return self
-
-
-settings = Settings()
-
-
-from pydantic import model_validator
-from pydantic_settings import BaseSettings, SettingsConfigDict
+    """Application configuration loaded from environment variables.
 
-
-class Settings(BaseSettings):
-    """Application configuration loaded from environment variables."""
+    Credentials are optional at load time so the app (and its tests) can
+    start without them; code that talks to a provider calls ``require``.
+    """
 
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, extra="ignore")
 
@@ -71,16 +23,60 @@ class Settings(BaseSettings):
     CORS_ORIGINS: List[str] = ["*"]
 
     # Pinecone
-    PINECONE_API_KEY: str
-    PINECONE_INDEX_NAME: str
+    PINECONE_API_KEY: Optional[str] = None
+    PINECONE_INDEX_NAME: Optional[str] = None
     PINECONE_ENVIRONMENT: Optional[str] = None
     PINECONE_ENV: Optional[str] = None  # backward compat
 
     # OpenAI/LLM
-    OPENAI_API_KEY: str
+    OPENAI_API_KEY: Optional[str] = None
     LLM_MODEL: str = "gpt-3.5-turbo"
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     EMBEDDING_DIM: int = 1024
+    EMBEDDING_CACHE_SIZE: int = 2048  # query embeddings kept in memory
+
+    # Retrieval
+    VECTOR_BACKEND: str = "pinecone"  # "pinecone" or "local"
+    LOCAL_INDEX_DIR: str = "data/index"
+    INGEST_MANIFEST_DIR: str = "data/manifests"
+    RETRIEVAL_MAX_CONCURRENCY: int = 8
+    RETRIEVAL_NAMESPACE_TIMEOUT: float = 5.0  # seconds
+    CONTEXT_MAX_TOKENS: int = 3000  # prompt budget for retrieved chunks
+    HYBRID_SEARCH_ENABLED: bool = True  # fuse BM25 where a lexical index exists
+    LEXICAL_INDEX_DIR: str = "data/lexical"
+    HYBRID_RRF_K: int = 60
+    MMR_FETCH_K: int = 20  # candidates per namespace when a request sets use_mmr
+    MMR_LAMBDA: float = 0.5  # 1.0 = pure relevance, lower = more diverse
+    ROUTER_ENABLED: bool = False  # opt in once ROUTER_MARGIN is tuned on real traffic
+    ROUTER_MARGIN: float = 0.05  # lead chit-chat/off-topic need over in-domain
+    ROUTER_NAMESPACE_MARGIN: float = 0.02  # lead needed to search one namespace
+    ROUTER_SAMPLE_SIZE: int = 500  # Pinecone vectors fetched per namespace centroid
+
+    # Answer cache
+    CACHE_BACKEND: str = "memory"  # "memory" or "disk" (shared by workers)
+    CACHE_DIR: str = ".cache"
+    CACHE_MAX_ENTRIES: int = 10_000
+    CACHE_TTL_SECONDS: int = 600
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.93  # cosine similarity for a hit
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 4096  # per namespace
+
+    # Batch queries
+    BATCH_MAX_QUESTIONS: int = 1000
+    BATCH_MAX_CONCURRENCY: int = 8  # questions generating at once
+
+    # Cache warm-up at startup
+    WARMUP_QUESTIONS_PATH: Optional[str] = None  # question list or JSONL query log
+    WARMUP_LIMIT: int = 200
+    WARMUP_CONCURRENCY: int = 4
+
+    # Readiness probes
+    READINESS_PROBE_INTERVAL: float = 15.0  # seconds between background checks
+    READINESS_PROBE_TIMEOUT: float = 5.0
+
+    # Streaming
+    STREAM_HEARTBEAT_SECONDS: float = 15.0
 
     # Optional extras (ignored if not set)
     GOOGLE_API_KEY: Optional[str] = None
@@ -89,6 +85,14 @@ class Settings(BaseSettings):
     # Rate limiting
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_WINDOW: int = 60  # seconds
+    RATE_LIMIT_MAX_CLIENTS: int = 10_000  # tracked client buckets
+    RATE_LIMIT_TRUSTED_PROXIES: int = 0  # set to 1 behind the bundled nginx
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" or "shared" (across workers)
+    RATE_LIMIT_STATE_PATH: str = ".cache/rate_limit.sqlite3"
+
+    # Metrics
+    METRICS_MULTIPROC_DIR: Optional[str] = None  # per-worker snapshots for /metrics
+    METRICS_FLUSH_SECONDS: float = 5.0
 
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -98,63 +102,28 @@ class Settings(BaseSettings):
         # Allow PINECONE_ENV as alias for PINECONE_ENVIRONMENT
         if not self.PINECONE_ENVIRONMENT and self.PINECONE_ENV:
             self.PINECONE_ENVIRONMENT = self.PINECONE_ENV
-        if not self.PINECONE_ENVIRONMENT:
-            raise ValueError("PINECONE_ENVIRONMENT (or PINECONE_ENV) is required")
         return self
 
+    def require(self, *names: str):
+        """Raise if any of the named settings is unset."""
+        missing = [name for name in names if not getattr(self, name)]
+        if missing:
+            raise ValueError(f"Missing required settings: {', '.join(missing)}")
 
-settings = Settings()
-
-
-from pydantic import model_validator
-from pydantic_settings import BaseSettings, SettingsConfigDict
-
-
-class Settings(BaseSettings):
-    """Application configuration loaded from environment variables."""
-
-    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, extra="ignore")
 
-    # API
-    HOST: str = "0.0.0.0"
-    PORT: int = 8000
-    DEBUG: bool = False
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings()
 
-    # CORS
-    CORS_ORIGINS: List[str] = ["*"]
 
-    # Pinecone
-    PINECONE_API_KEY: str
-    PINECONE_INDEX_NAME: str
-    PINECONE_ENVIRONMENT: Optional[str] = None
-    PINECONE_ENV: Optional[str] = None  # backward compat
+class _LazySettings:
+    """Module-level ``settings`` that reads the environment on first access."""
 
-    # OpenAI/LLM
-    OPENAI_API_KEY: str
-    LLM_MODEL: str = "gpt-3.5-turbo"
-    EMBEDDING_MODEL: str = "text-embedding-3-small"
-    EMBEDDING_DIM: int = 1024
-
-    # Optional extras (ignored if not set)
-    GOOGLE_API_KEY: Optional[str] = None
-    FIREBASE_CREDS: Optional[str] = None
-
-    # Rate limiting
-    RATE_LIMIT_REQUESTS: int = 100
-    RATE_LIMIT_WINDOW: int = 60  # seconds
-
-    # Logging
-    LOG_LEVEL: str = "INFO"
-
-    @model_validator(mode="after")
-    def populate_env_from_alias(self):
-        # Allow PINECONE_ENV as alias for PINECONE_ENVIRONMENT
-        if not self.PINECONE_ENVIRONMENT and self.PINECONE_ENV:
-            self.PINECONE_ENVIRONMENT = self.PINECONE_ENV
-        if not self.PINECONE_ENVIRONMENT:
-            raise ValueError("PINECONE_ENVIRONMENT (or PINECONE_ENV) is required")
-        return self
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
 
+    def __setattr__(self, name: str, value):
+        setattr(get_settings(), name, value)
 
-settings = Settings()
 
+settings: Settings = _LazySettings()  # type: ignore[assignment]
@@ -1,16 +1,99 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Literal
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import PlainTextResponse, StreamingResponse, JSONResponse
 from pydantic import BaseModel, model_validator
 import uvicorn
 
 from config.settings import settings
-from services.rag_service import RAGService
+from services.probes import DependencyProbes, build_probes
+from services.warmup import warm_up_from_file
+from middleware.metrics import MetricsMiddleware
 from middleware.rate_limit import RateLimitMiddleware
+from utils import metrics
 from utils.logger import setup_logger
 
+if TYPE_CHECKING:
+    from services.rag_service import RAGService
+
 logger = setup_logger(__name__)
-app = FastAPI(title="RAG API", version="1.0.0")
+
+_STREAMS_ABANDONED = metrics.STREAMS_ABANDONED.labels()
+
+NAMESPACES = ["computer-networking-pdf", "networking-pdf"]
+
+# Built on first use (or by the startup task) so importing this module stays
+# cheap and does not need credentials.
+rag_service: "RAGService | None" = None
+_rag_service_lock = asyncio.Lock()
+
+# Background service construction and cache warm-up; /ready reports not
+# ready until it finishes and the dependency probes pass.
+startup_task: asyncio.Task | None = None
+probes: DependencyProbes | None = None
+
+
+def _build_rag_service() -> "RAGService":
+    from services.rag_service import RAGService
+
+    return RAGService(namespaces=NAMESPACES)
+
+
+async def get_rag_service() -> "RAGService":
+    global rag_service
+    if rag_service is None:
+        async with _rag_service_lock:
+            if rag_service is None:
+                # Importing LangChain/OpenAI and building clients takes seconds;
+                # keep it off the event loop.
+                rag_service = await asyncio.to_thread(_build_rag_service)
+    return rag_service
+
+
+async def _startup():
+    global probes
+    try:
+        service = await get_rag_service()
+        probes = DependencyProbes(
+            build_probes(service),
+            interval=settings.READINESS_PROBE_INTERVAL,
+            timeout=settings.READINESS_PROBE_TIMEOUT,
+        )
+        probes.start()
+        try:
+            await service.load_router()
+        except Exception as e:
+            logger.warning("Query router unavailable, answering every query: %s", e)
+        if settings.WARMUP_QUESTIONS_PATH:
+            await warm_up_from_file(service, settings.WARMUP_QUESTIONS_PATH)
+    except Exception as e:
+        logger.error("Startup failed: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global startup_task
+    startup_task = asyncio.create_task(_startup())
+    flusher = None
+    if settings.METRICS_MULTIPROC_DIR:
+        flusher = asyncio.create_task(
+            metrics.flush_periodically(settings.METRICS_MULTIPROC_DIR, settings.METRICS_FLUSH_SECONDS)
+        )
+    yield
+    if flusher is not None:
+        flusher.cancel()
+    if not startup_task.done():
+        startup_task.cancel()
+    if probes is not None:
+        await probes.stop()
+
+
+app = FastAPI(title="RAG API", version="1.0.0", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -25,8 +108,8 @@ app.add_middleware(
 # Rate Limiting
 app.add_middleware(RateLimitMiddleware)
 
-# Initialize RAG Service
-rag_service = RAGService(namespaces=["computer-networking-pdf", "networking-pdf"])
+# Request metrics (outermost, so rate-limited requests are counted too)
+app.add_middleware(MetricsMiddleware)
 
 
 class QueryRequest(BaseModel):
@@ -35,6 +118,13 @@ class QueryRequest(BaseModel):
     namespace: str = "default"
     top_k: int = 5
     include_sources: bool = False
+    # Streaming format for /ask: raw answer text, Server-Sent Events or NDJSON.
+    stream_format: Literal["text", "sse", "ndjson"] = "text"
+    # Diversify retrieved chunks with maximal marginal relevance; unset
+    # fetch_k / mmr_lambda fall back to MMR_FETCH_K / MMR_LAMBDA.
+    use_mmr: bool = False
+    fetch_k: int | None = None
+    mmr_lambda: float | None = None
 
     @model_validator(mode="before")
     def fill_query(cls, values):
@@ -46,8 +136,38 @@ class QueryRequest(BaseModel):
     def ensure_query(cls, values):
         if not values.query or not values.query.strip():
             raise ValueError("Field 'query' is required.")
+        if values.mmr_lambda is not None and not 0.0 <= values.mmr_lambda <= 1.0:
+            raise ValueError("'mmr_lambda' must be between 0 and 1.")
+        if values.fetch_k is not None and values.fetch_k < values.top_k:
+            raise ValueError("'fetch_k' must be at least 'top_k'.")
         return values
 
+    def mmr_options(self) -> Dict:
+        """Keyword arguments for RAGService.query / query_stream."""
+        if not self.use_mmr:
+            return {}
+        return {
+            "mmr_lambda": settings.MMR_LAMBDA if self.mmr_lambda is None else self.mmr_lambda,
+            "fetch_k": self.fetch_k,
+        }
+
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    namespace: str = "default"
+    top_k: int = 5
+    include_sources: bool = False
+
+    @model_validator(mode="after")
+    def check_questions(self):
+        if not self.questions:
+            raise ValueError("Field 'questions' must not be empty.")
+        if len(self.questions) > settings.BATCH_MAX_QUESTIONS:
+            raise ValueError(f"At most {settings.BATCH_MAX_QUESTIONS} questions per batch.")
+        if any(not q or not q.strip() for q in self.questions):
+            raise ValueError("Questions must not be blank.")
+        return self
+
 
 class QueryResponse(BaseModel):
     answer: str
@@ -58,10 +178,12 @@ class QueryResponse(BaseModel):
 @app.post("/query")
 async def query_rag(request: QueryRequest):
     try:
-        result = await rag_service.query(
+        service = await get_rag_service()
+        result = await service.query(
             query=request.query,
             namespace=request.namespace,
             top_k=request.top_k,
+            **request.mmr_options(),
         )
         
         if not request.include_sources:
@@ -80,26 +202,192 @@ async def query_rag(request: QueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _timed_events(events: AsyncIterator[Dict], started: float) -> AsyncIterator[Dict]:
+    """Annotate query_stream events with server timings for this request."""
+    first_token_at = None
+    tokens = 0
+    try:
+        async for event in events:
+            now = time.perf_counter()
+            kind = event.get("type")
+            if kind == "sources":
+                event = {**event, "retrieval_ms": round((now - started) * 1000, 1)}
+            elif kind == "token":
+                tokens += 1
+                if first_token_at is None:
+                    first_token_at = now
+                    event = {**event, "ttft_ms": round((now - started) * 1000, 1)}
+            elif kind == "complete":
+                generation_s = now - first_token_at if first_token_at is not None else 0.0
+                event = {
+                    **event,
+                    "total_ms": round((now - started) * 1000, 1),
+                    "tokens": tokens,
+                    "tokens_per_s": (
+                        round((tokens - 1) / generation_s, 1) if tokens > 1 and generation_s > 0 else None
+                    ),
+                }
+            yield event
+    finally:
+        await events.aclose()
+
+
+async def _wait_for_disconnect(request: Request):
+    # The JSON body has already been read, so the next message on the
+    # channel is the disconnect.
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def _stream_events(
+    events: AsyncIterator[Dict], request: Request, heartbeat: float | None = None
+) -> AsyncIterator[Dict | None]:
+    """Relay events until they end or the client disconnects.
+
+    Yields None whenever ``heartbeat`` seconds pass without an event. A
+    disconnect is noticed even while waiting on retrieval or the LLM; the
+    pending read is cancelled and ``events`` closed, which lets RAGService
+    cancel the upstream generation once no other request shares it.
+    """
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    next_event = None
+    finished = False
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(events.__anext__())
+            done, _ = await asyncio.wait(
+                {next_event, watcher}, timeout=heartbeat, return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_event in done:
+                try:
+                    event = next_event.result()
+                except StopAsyncIteration:
+                    finished = True
+                    return
+                next_event = None
+                yield event
+            elif watcher in done:
+                logger.info("Client disconnected; stopping stream")
+                return
+            else:
+                yield None
+    finally:
+        if not finished:
+            # Covers our own watcher and the server cancelling the response.
+            _STREAMS_ABANDONED.inc()
+        watcher.cancel()
+        if next_event is not None and not next_event.done():
+            next_event.cancel()
+            await asyncio.wait({next_event})
+        await events.aclose()
+
+
+def _encode_sse(event: Dict | None) -> str:
+    if event is None:
+        return ": ping\n\n"
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@app.post("/query/batch")
+async def query_batch(request: BatchQueryRequest, raw_request: Request):
+    """Answer many questions; one NDJSON line per distinct question, in completion order."""
+    service = await get_rag_service()
+    results = service.query_batch(
+        request.questions, namespace=request.namespace, top_k=request.top_k
+    )
+
+    async def result_lines():
+        async for result in _stream_events(results, raw_request):
+            if not request.include_sources:
+                result.pop("sources", None)
+            yield _encode_ndjson(result)
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+
+def _encode_ndjson(event: Dict | None) -> str:
+    if event is None:
+        event = {"type": "heartbeat"}
+    return json.dumps(event, default=str) + "\n"
+
+
 # Streaming endpoint
 @app.post("/ask")
-async def ask_stream(request: QueryRequest):
-    async def token_generator():
-        async for event in rag_service.query_stream(
-            query=request.query,
-            namespace=request.namespace,
-            top_k=request.top_k,
+async def ask_stream(request: QueryRequest, raw_request: Request):
+    stream_format = request.stream_format
+    if stream_format == "text" and "text/event-stream" in raw_request.headers.get("accept", ""):
+        stream_format = "sse"
+
+    service = await get_rag_service()
+    events = service.query_stream(
+        query=request.query,
+        namespace=request.namespace,
+        top_k=request.top_k,
+        **request.mmr_options(),
+    )
+
+    if stream_format == "text":
+        async def token_generator():
+            async for event in _stream_events(events, raw_request):
+                if event.get("type") == "token":
+                    yield event["content"]
+
+        return StreamingResponse(token_generator(), media_type="text/plain")
+
+    encode = _encode_sse if stream_format == "sse" else _encode_ndjson
+    started = time.perf_counter()
+
+    async def event_generator():
+        timed = _timed_events(events, started)
+        async for event in _stream_events(
+            timed, raw_request, heartbeat=settings.STREAM_HEARTBEAT_SECONDS
         ):
-            if event.get("type") == "token":
-                yield event["content"]
+            yield encode(event)
 
-    return StreamingResponse(token_generator(), media_type="text/plain")
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream" if stream_format == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up and serving. See /ready for traffic."""
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape target, summed across workers when METRICS_MULTIPROC_DIR is set."""
+    return PlainTextResponse(
+        metrics.render(settings.METRICS_MULTIPROC_DIR), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness from cached probe results; never calls a dependency itself."""
+    if startup_task is None or not startup_task.done():
+        startup = "starting"
+    elif rag_service is None:
+        startup = "failed"
+    else:
+        startup = "done"
+    ready = startup == "done" and probes is not None and probes.ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "startup": startup,
+            "probes": probes.snapshot() if probes is not None else {},
+        },
+    )
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -0,0 +1,36 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils import metrics
+
+_IN_FLIGHT = metrics.HTTP_IN_FLIGHT.labels()
+_BY_STATUS = {f"{n}xx": metrics.HTTP_REQUESTS.labels(f"{n}xx") for n in range(1, 6)}
+
+
+class MetricsMiddleware:
+    """Count HTTP requests by status class and track how many are in flight.
+
+    Streaming responses stay in flight until their last chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        _IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _IN_FLIGHT.dec()
+            _BY_STATUS.get(f"{status // 100}xx", _BY_STATUS["5xx"]).inc()
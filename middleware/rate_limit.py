@@ -1,128 +1,127 @@
 import time
-from typing import Callable
+from collections import OrderedDict
+from typing import List, Optional
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from config.settings import settings
+from middleware.shared_buckets import SharedTokenBuckets
+from utils import metrics
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple in-memory rate limiter (no Redis)."""
-
-    def __init__(self, app):
-        super().__init__(app)
-        self.requests = {}
-        self.max_requests = settings.RATE_LIMIT_REQUESTS
-        self.window = settings.RATE_LIMIT_WINDOW
-
-    async def dispatch(self, request: Request, call_next: Callable):
-        client_ip = request.client.host if request.client else "anonymous"
-        now = time.time()
-        window_start, count = self.requests.get(client_ip, (now, 0))
-
-        if now - window_start >= self.window:
-            window_start, count = now, 0
-
-        count += 1
-        self.requests[client_ip] = (window_start, count)
-
-        if count > self.max_requests:
-            logger.warning("Rate limit exceeded for %s", client_ip)
-            return Response(
-                content="Rate limit exceeded. Try again later.",
-                status_code=429,
-            )
-
-        return await call_next(request)
-
-
-
-from typing import Callable
-
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-
-from config.settings import settings
-from utils.logger import get_logger
-
-logger = get_logger(__name__)
-
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple in-memory rate limiter (no Redis)."""
-
-    def __init__(self, app):
-        super().__init__(app)
-        self.requests = {}
-        self.max_requests = settings.RATE_LIMIT_REQUESTS
-        self.window = settings.RATE_LIMIT_WINDOW
-
-    async def dispatch(self, request: Request, call_next: Callable):
-        client_ip = request.client.host if request.client else "anonymous"
-        now = time.time()
-        window_start, count = self.requests.get(client_ip, (now, 0))
-
-        if now - window_start >= self.window:
-            window_start, count = now, 0
-
-        count += 1
-        self.requests[client_ip] = (window_start, count)
-
-        if count > self.max_requests:
-            logger.warning("Rate limit exceeded for %s", client_ip)
-            return Response(
-                content="Rate limit exceeded. Try again later.",
-                status_code=429,
+_REJECTIONS = metrics.RATE_LIMITED.labels()
+
+
+class RateLimitMiddleware:
+    """Token-bucket rate limiter (no Redis), as plain ASGI middleware.
+
+    Each client gets a bucket of ``max_requests`` tokens that refills over
+    ``window`` seconds. Buckets live in an LRU capped at ``max_clients`` keys;
+    buckets idle long enough to be full again are swept from the cold end on
+    every request, so memory stays flat even under a crawl of distinct IPs.
+
+    With ``shared_state_path`` (RATE_LIMIT_BACKEND="shared") the buckets live
+    in a SQLite file instead, so all gunicorn workers on the host enforce one
+    limit per client rather than one per worker.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_requests: Optional[int] = None,
+        window: Optional[float] = None,
+        max_clients: Optional[int] = None,
+        trusted_proxies: Optional[int] = None,
+        shared_state_path: Optional[str] = None,
+    ):
+        self.app = app
+        self.max_requests = max_requests or settings.RATE_LIMIT_REQUESTS
+        self.window = window or settings.RATE_LIMIT_WINDOW
+        self.max_clients = max_clients or settings.RATE_LIMIT_MAX_CLIENTS
+        self.trusted_proxies = (
+            trusted_proxies if trusted_proxies is not None else settings.RATE_LIMIT_TRUSTED_PROXIES
+        )
+        self.refill_rate = self.max_requests / self.window
+        # client -> [tokens, last_seen]; least recently seen first
+        self.buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+        if shared_state_path is None and settings.RATE_LIMIT_BACKEND == "shared":
+            shared_state_path = settings.RATE_LIMIT_STATE_PATH
+        self.shared = (
+            SharedTokenBuckets(
+                shared_state_path, self.max_requests, self.window, max_clients=self.max_clients
             )
-
-        return await call_next(request)
-
-
-
-from typing import Callable
-
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-
-from config.settings import settings
-from utils.logger import get_logger
-
-logger = get_logger(__name__)
-
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple in-memory rate limiter (no Redis)."""
-
-    def __init__(self, app):
-        super().__init__(app)
-        self.requests = {}
-        self.max_requests = settings.RATE_LIMIT_REQUESTS
-        self.window = settings.RATE_LIMIT_WINDOW
-
-    async def dispatch(self, request: Request, call_next: Callable):
-        client_ip = request.client.host if request.client else "anonymous"
-        now = time.time()
-        window_start, count = self.requests.get(client_ip, (now, 0))
-
-        if now - window_start >= self.window:
-            window_start, count = now, 0
-
-        count += 1
-        self.requests[client_ip] = (window_start, count)
-
-        if count > self.max_requests:
-            logger.warning("Rate limit exceeded for %s", client_ip)
-            return Response(
-                content="Rate limit exceeded. Try again later.",
-                status_code=429,
-            )
-
-        return await call_next(request)
-
-
-
-
+            if shared_state_path
+            else None
+        )
+
+    def _client_key(self, scope: Scope) -> str:
+        if self.trusted_proxies:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-forwarded-for":
+                    hops = [ip.strip() for ip in value.decode("latin-1").split(",")]
+                    # Each trusted proxy appends the address it saw; the entry
+                    # they added last-but-N is the real client.
+                    if len(hops) >= self.trusted_proxies:
+                        return hops[-self.trusted_proxies]
+                    return hops[0]
+        client = scope.get("client")
+        return client[0] if client else "anonymous"
+
+    def _sweep(self, now: float):
+        # A bucket idle for a full window has refilled, which is the same as
+        # having no state at all.
+        buckets = self.buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if now - bucket[1] < self.window and len(buckets) <= self.max_clients:
+                break
+            buckets.popitem(last=False)
+
+    def allow(self, key: str, now: float) -> bool:
+        if self.shared is not None:
+            return self.shared.allow(key, now)
+
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [float(self.max_requests), now]
+        else:
+            elapsed = max(0.0, now - bucket[1])
+            bucket[0] = min(self.max_requests, bucket[0] + elapsed * self.refill_rate)
+            bucket[1] = now
+            self.buckets.move_to_end(key)
+        self._sweep(now)
+
+        if bucket[0] < 1.0:
+            return False
+        bucket[0] -= 1.0
+        return True
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client_ip = self._client_key(scope)
+        # Wall-clock time, so timestamps are comparable across worker processes.
+        if self.allow(client_ip, time.time()):
+            await self.app(scope, receive, send)
+            return
+
+        _REJECTIONS.inc()
+        logger.warning("Rate limit exceeded for %s", client_ip)
+        body = b"Rate limit exceeded. Try again later."
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(1, int(1 / self.refill_rate))).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import threading
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class SharedTokenBuckets:
+    """Token buckets in a SQLite file shared by every worker on the host.
+
+    Each check is a single UPSERT ... RETURNING statement, which SQLite runs
+    atomically under its write lock, so concurrent workers never double-spend
+    a token. The file uses WAL with synchronous=OFF: losing limiter state in
+    a crash only means clients get a fresh bucket. Full (idle) buckets are
+    swept every ``sweep_interval`` checks, and the table is trimmed to
+    ``max_clients`` rows.
+
+    Checks run on the event loop, so the busy timeout is only a few
+    milliseconds. If the file stays locked or SQLite fails, the request is
+    let through (fail open): a briefly unenforced limit is better than
+    stalling or failing every request.
+    """
+
+    _UPSERT = (
+        "INSERT INTO buckets (key, tokens, updated, allowed) VALUES (?, ? - 1, ?, 1) "
+        "ON CONFLICT(key) DO UPDATE SET "
+        "tokens = CASE WHEN MIN(?, tokens + MAX(0, excluded.updated - updated) * ?) >= 1 "
+        "THEN MIN(?, tokens + MAX(0, excluded.updated - updated) * ?) - 1 "
+        "ELSE MIN(?, tokens + MAX(0, excluded.updated - updated) * ?) END, "
+        "allowed = MIN(?, tokens + MAX(0, excluded.updated - updated) * ?) >= 1, "
+        "updated = excluded.updated "
+        "RETURNING allowed"
+    )
+
+    def __init__(
+        self,
+        path: str,
+        max_requests: int,
+        window: float,
+        max_clients: int = 10_000,
+        sweep_interval: int = 1024,
+        busy_timeout: float = 0.005,
+    ):
+        self.capacity = float(max_requests)
+        self.window = window
+        self.refill_rate = max_requests / window
+        self.max_clients = max_clients
+        self.sweep_interval = sweep_interval
+        self._checks = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, timeout=busy_timeout, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, allowed INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updated)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+    def allow(self, key: str, now: float) -> bool:
+        cap, rate = self.capacity, self.refill_rate
+        with self._lock:
+            try:
+                allowed = self._conn.execute(
+                    self._UPSERT, (key, cap, now, cap, rate, cap, rate, cap, rate, cap, rate)
+                ).fetchone()[0]
+                self._checks += 1
+                if self._checks % self.sweep_interval == 0:
+                    self._sweep(now)
+            except sqlite3.Error as e:
+                logger.warning("Shared rate limit state unavailable, allowing request: %s", e)
+                return True
+        return bool(allowed)
+
+    def _sweep(self, now: float):
+        self._conn.execute("DELETE FROM buckets WHERE updated <= ?", (now - self.window,))
+        self._conn.execute(
+            "DELETE FROM buckets WHERE key IN (SELECT key FROM buckets ORDER BY updated DESC "
+            "LIMIT -1 OFFSET ?)",
+            (self.max_clients,),
+        )
@@ -0,0 +1,115 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence
+
+import tiktoken
+from langchain_core.documents import Document
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+_FALLBACK_ENCODING = "cl100k_base"
+# Rough English average, used only when no tiktoken encoding can be loaded.
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model: str) -> Optional["tiktoken.Encoding"]:
+    """Return the tiktoken encoding for ``model``, loaded once per process.
+
+    tiktoken downloads encoding files on first use; if that fails (no network,
+    no TIKTOKEN_CACHE_DIR) this returns None and callers fall back to a
+    character-based estimate.
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(_FALLBACK_ENCODING)
+    except Exception as e:
+        logger.warning("tiktoken encoding for %s unavailable (%s); estimating tokens", model, e)
+        return None
+
+
+def format_doc(doc: Document) -> str:
+    return f"[Source: {doc.metadata.get('source_namespace', 'unknown')}]\n{doc.page_content}"
+
+
+@dataclass
+class PackedContext:
+    docs: List[Document] = field(default_factory=list)
+    tokens: int = 0
+    truncated: bool = False
+    dropped: int = 0
+
+
+class ContextPacker:
+    """Fit retrieved chunks into a prompt token budget.
+
+    Chunks are taken best score first, or in the given order with
+    ``preserve_order`` (MMR picks are already ranked for relevance and
+    diversity). The first chunk that does not fit is
+    cut to the remaining budget if at least ``min_chunk_tokens`` remain;
+    it and everything after it are otherwise dropped.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        model: str,
+        separator: str = CONTEXT_SEPARATOR,
+        min_chunk_tokens: int = 64,
+    ):
+        self.max_tokens = max_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+        self.encoding = get_encoding(model)
+        self.separator_tokens = self.count(separator)
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return -(-len(text) // _CHARS_PER_TOKEN)
+        return len(self.encoding.encode_ordinary(text))
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        if self.encoding is None:
+            return text[: tokens * _CHARS_PER_TOKEN]
+        return self.encoding.decode(self.encoding.encode_ordinary(text)[:tokens])
+
+    def pack(
+        self,
+        docs: Sequence[Document],
+        score: Callable[[Document], float] = lambda doc: doc.metadata.get("score", 0.0),
+        preserve_order: bool = False,
+    ) -> PackedContext:
+        packed = PackedContext()
+        ordered = list(docs) if preserve_order else sorted(docs, key=score, reverse=True)
+        for used, doc in enumerate(ordered):
+            separator = self.separator_tokens if packed.docs else 0
+            cost = self.count(format_doc(doc)) + separator
+            remaining = self.max_tokens - packed.tokens
+            if cost <= remaining:
+                packed.docs.append(doc)
+                packed.tokens += cost
+                continue
+
+            room = remaining - (cost - self.count(doc.page_content))
+            while room >= self.min_chunk_tokens:
+                cut = Document(
+                    id=doc.id,
+                    page_content=self._truncate(doc.page_content, room),
+                    metadata={**doc.metadata, "truncated": True},
+                )
+                # Tokens can merge across the header boundary, so re-count.
+                cost = self.count(format_doc(cut)) + separator
+                if cost <= remaining:
+                    packed.docs.append(cut)
+                    packed.tokens += cost
+                    packed.truncated = True
+                    used += 1
+                    break
+                room -= cost - remaining
+            packed.dropped = len(ordered) - used
+            break
+        return packed
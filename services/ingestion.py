@@ -0,0 +1,524 @@
+"""PDF ingestion: parse, chunk, embed and upsert into a namespace.
+
+Usage:
+    python -m services.ingestion docs/ --namespace computer-networking-pdf
+    python -m services.ingestion a.pdf b.pdf --namespace networking-pdf --backend local
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import xxhash
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+from config.settings import settings
+from services.lexical_index import LexicalIndex
+from services.local_index import LocalVectorIndex
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Chunk = Dict  # {"id": str, "text": str, "metadata": dict}
+
+
+@dataclass
+class IngestStats:
+    files: int = 0
+    pages: int = 0
+    chunks: int = 0
+    skipped_files: int = 0
+    skipped_chunks: int = 0
+    deleted_chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files} files, {self.pages} pages, {self.chunks} chunks in "
+            f"{self.seconds:.1f}s ({self.pages_per_second:.1f} pages/s, "
+            f"{self.chunks_per_second:.1f} chunks/s); {self.skipped_files} files and "
+            f"{self.skipped_chunks} chunks unchanged, {self.deleted_chunks} chunks deleted"
+        )
+
+
+def discover_pdfs(paths: Iterable[str]) -> Iterator[str]:
+    """Yield PDF files from the given files and directories, recursively."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(".pdf"):
+                        yield os.path.join(root, name)
+        elif path.lower().endswith(".pdf"):
+            yield path
+
+
+@lru_cache(maxsize=4)
+def _splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    digest = xxhash.xxh3_64()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def inspect_pdf(path: str) -> Tuple[str, int]:
+    """Return (content hash, page count) of a PDF. Runs in a worker process."""
+    return hash_file(path), len(PdfReader(path).pages)
+
+
+def parse_pages(
+    path: str, start: int, end: int, chunk_size: int, chunk_overlap: int
+) -> List[Dict]:
+    """Extract and chunk pages [start, end) of one PDF. Runs in a worker process.
+
+    Returns one entry per page with the page text hash and its chunks. Chunk
+    ids derive from the file path, page number and chunk text, so an
+    unchanged chunk keeps its id across re-ingestion runs.
+    """
+    reader = PdfReader(path)
+    splitter = _splitter(chunk_size, chunk_overlap)
+    source = os.path.basename(path)
+    file_id = xxhash.xxh3_64_hexdigest(os.path.abspath(path))
+
+    pages: List[Dict] = []
+    for page_number in range(start, min(end, len(reader.pages))):
+        text = reader.pages[page_number].extract_text() or ""
+        chunks: List[Chunk] = []
+        for piece in splitter.split_text(text):
+            chunk_hash = xxhash.xxh3_64_hexdigest(piece)
+            chunks.append(
+                {
+                    "id": f"{file_id}-{page_number}-{chunk_hash}",
+                    "text": piece,
+                    "metadata": {"source": source, "page": page_number + 1},
+                }
+            )
+        pages.append(
+            {
+                "path": path,
+                "page": page_number,
+                "hash": xxhash.xxh3_64_hexdigest(text),
+                "chunks": chunks,
+            }
+        )
+    return pages
+
+
+class IngestManifest:
+    """Record of what has been ingested into a namespace.
+
+    Maps each file to its content hash and, per page, the page text hash and
+    the ids of the chunks upserted for it.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    def chunk_ids(self, key: str) -> List[str]:
+        entry = self.files.get(key, {})
+        return [cid for page in entry.get("pages", {}).values() for cid in page["chunks"]]
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": self.files}, f)
+        os.replace(tmp, self.path)
+
+
+async def embed_with_retry(
+    embeddings, texts: List[str], attempts: int = 5, base_delay: float = 1.0
+) -> List[List[float]]:
+    """Embed a batch, retrying transient failures with exponential backoff."""
+    for attempt in range(attempts):
+        try:
+            return await embeddings.aembed_documents(texts)
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise
+            delay = base_delay * (2**attempt) * (0.5 + random.random())
+            logger.warning("Embedding batch failed (%s); retrying in %.1fs", str(e), delay)
+            await asyncio.sleep(delay)
+    raise RuntimeError("unreachable")
+
+
+class PineconeSink:
+    """Upserts chunks into a Pinecone namespace in fixed-size batches."""
+
+    def __init__(self, index, namespace: str, batch_size: int = 100):
+        self.index = index
+        self.namespace = namespace
+        self.batch_size = batch_size
+
+    async def upsert(self, chunks: Sequence[Chunk], vectors: Sequence[List[float]]):
+        records = [
+            # PineconeVectorStore reads the chunk text from the "text" metadata key.
+            (chunk["id"], vector, {**chunk["metadata"], "text": chunk["text"]})
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        await asyncio.gather(
+            *(
+                asyncio.to_thread(
+                    self.index.upsert,
+                    vectors=records[i : i + self.batch_size],
+                    namespace=self.namespace,
+                    show_progress=False,
+                )
+                for i in range(0, len(records), self.batch_size)
+            )
+        )
+
+    async def delete(self, ids: Sequence[str]):
+        ids = list(ids)
+        for i in range(0, len(ids), 1000):
+            await asyncio.to_thread(
+                self.index.delete, ids=ids[i : i + 1000], namespace=self.namespace
+            )
+
+    def close(self):
+        pass
+
+
+class LocalIndexSink:
+    """Accumulates chunks into a LocalVectorIndex and saves it on close.
+
+    Upserts are buffered and added in one call on close: ``add`` copies the
+    whole matrix, so adding batch by batch would make ingestion quadratic in
+    the number of chunks.
+    """
+
+    def __init__(self, path: str, dim: int, dtype: str = "float32"):
+        self.path = path
+        self.dtype = dtype
+        self.index = LocalVectorIndex.load(path, dim=dim, mmap=False)
+        # id -> (vector, text, metadata); a later upsert of an id replaces it.
+        self._pending: Dict[str, Tuple[Sequence[float], str, Dict]] = {}
+
+    async def upsert(self, chunks: Sequence[Chunk], vectors: Sequence[List[float]]):
+        for chunk, vector in zip(chunks, vectors):
+            self._pending[chunk["id"]] = (vector, chunk["text"], chunk["metadata"])
+
+    async def delete(self, ids: Sequence[str]):
+        for doc_id in ids:
+            self._pending.pop(doc_id, None)
+        self.index.delete(ids)
+
+    def flush(self):
+        if not self._pending:
+            return
+        ids = list(self._pending)
+        vectors, texts, metadatas = zip(*self._pending.values())
+        self.index.add(ids, vectors, list(texts), list(metadatas))
+        self._pending = {}
+
+    def close(self):
+        self.flush()
+        self.index.save(self.path, dtype=self.dtype)
+
+
+class LexicalIndexSink:
+    """Wraps another sink and keeps a BM25 LexicalIndex in step with it."""
+
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        self.path = path
+        self.index = LexicalIndex.load(path, mmap=False)
+
+    async def upsert(self, chunks: Sequence[Chunk], vectors: Sequence[List[float]]):
+        await self.inner.upsert(chunks, vectors)
+        self.index.add(
+            [chunk["id"] for chunk in chunks],
+            [chunk["text"] for chunk in chunks],
+            [chunk["metadata"] for chunk in chunks],
+        )
+
+    async def delete(self, ids: Sequence[str]):
+        await self.inner.delete(ids)
+        self.index.delete(ids)
+
+    def close(self):
+        self.inner.close()
+        self.index.save(self.path)
+
+
+class IngestionPipeline:
+    """Stream PDFs through parse -> chunk -> embed -> upsert.
+
+    Page ranges are parsed in a process pool with a bounded number of tasks in
+    flight, so only a few pages per worker are held in memory at a time.
+    Chunks are embedded in large batches with bounded concurrency, and every
+    embedded batch is upserted as soon as it is ready.
+
+    With a manifest, re-runs are incremental: files whose content hash is
+    unchanged are skipped, only new or changed chunks are embedded, and
+    vectors for chunks that disappeared from a file, or for files deleted
+    from disk, are deleted. Files that still exist but were not passed in
+    are kept, so a run can add a single PDF to a namespace; ``prune``
+    deletes them too. ``force`` re-embeds everything while still deleting
+    vectors that disappeared.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        sink,
+        manifest: Optional[IngestManifest] = None,
+        force: bool = False,
+        prune: bool = False,
+        workers: Optional[int] = None,
+        pages_per_task: int = 16,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 150,
+        embed_batch_size: int = 256,
+        embed_concurrency: int = 4,
+    ):
+        self.embeddings = embeddings
+        self.sink = sink
+        self.manifest = manifest or IngestManifest()
+        self.force = force
+        self.prune = prune
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+
+    def _page_ranges(self, path: str, pages: int) -> Iterator[Tuple[str, int, int]]:
+        for start in range(0, pages, self.pages_per_task):
+            yield path, start, start + self.pages_per_task
+
+    async def _embed_and_upsert(self, chunks: List[Chunk], semaphore: asyncio.Semaphore):
+        async with semaphore:
+            vectors = await embed_with_retry(self.embeddings, [c["text"] for c in chunks])
+        await self.sink.upsert(chunks, vectors)
+
+    async def run(self, pdf_paths: Iterable[str]) -> IngestStats:
+        stats = IngestStats()
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.embed_concurrency)
+        parsing: set = set()
+        embedding: set = set()
+        buffer: List[Chunk] = []
+        # Files being re-ingested: key -> {"hash", "pages", "remaining", "failed"}
+        in_progress: Dict[str, Dict] = {}
+        range_files: Dict[asyncio.Future, str] = {}
+        seen: set = set()
+        stale_ids: List[str] = []
+
+        def flush(force: bool = False):
+            while len(buffer) >= self.embed_batch_size or (force and buffer):
+                batch = buffer[: self.embed_batch_size]
+                del buffer[: self.embed_batch_size]
+                embedding.add(asyncio.ensure_future(self._embed_and_upsert(batch, semaphore)))
+
+        def finish_file(key: str):
+            state = in_progress.pop(key)
+            if state["failed"]:
+                # Keep the previous record so the next run retries this file.
+                return
+            new_ids = {cid for page in state["pages"].values() for cid in page["chunks"]}
+            stale_ids.extend(cid for cid in self.manifest.chunk_ids(key) if cid not in new_ids)
+            self.manifest.files[key] = {"hash": state["hash"], "pages": state["pages"]}
+
+        def collect(key: str, pages: List[Dict]):
+            if self.force:
+                old_pages, old_ids = {}, set()
+            else:
+                old_pages = self.manifest.files.get(key, {}).get("pages", {})
+                old_ids = set(self.manifest.chunk_ids(key))
+            state = in_progress[key]
+            for page in pages:
+                old_page = old_pages.get(str(page["page"]))
+                chunk_ids = [chunk["id"] for chunk in page["chunks"]]
+                state["pages"][str(page["page"])] = {"hash": page["hash"], "chunks": chunk_ids}
+                if old_page is not None and old_page["hash"] == page["hash"]:
+                    stats.skipped_chunks += len(chunk_ids)
+                    continue
+                for chunk in page["chunks"]:
+                    if chunk["id"] in old_ids:
+                        stats.skipped_chunks += 1
+                    else:
+                        stats.chunks += 1
+                        buffer.append(chunk)
+            flush()
+
+        async def drain(pending: set, limit: int):
+            while len(pending) > limit:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending.difference_update(done)
+                for task in done:
+                    if pending is not parsing:
+                        task.result()
+                        continue
+                    key = range_files.pop(task)
+                    try:
+                        collect(key, task.result())
+                    except Exception as e:
+                        logger.error("Failed to parse %s: %s", key, str(e))
+                        in_progress[key]["failed"] = True
+                    in_progress[key]["remaining"] -= 1
+                    if in_progress[key]["remaining"] == 0:
+                        finish_file(key)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for path in pdf_paths:
+                key = os.path.abspath(path)
+                seen.add(key)
+                try:
+                    file_hash, pages = await loop.run_in_executor(pool, inspect_pdf, path)
+                except Exception as e:
+                    logger.error("Skipping unreadable PDF %s: %s", path, str(e))
+                    continue
+                stats.files += 1
+                if not self.force and self.manifest.files.get(key, {}).get("hash") == file_hash:
+                    stats.skipped_files += 1
+                    continue
+
+                stats.pages += pages
+                ranges = list(self._page_ranges(path, pages))
+                in_progress[key] = {
+                    "hash": file_hash,
+                    "pages": {},
+                    "remaining": len(ranges),
+                    "failed": False,
+                }
+                if not ranges:
+                    finish_file(key)
+                for args in ranges:
+                    future = loop.run_in_executor(
+                        pool, parse_pages, *args, self.chunk_size, self.chunk_overlap
+                    )
+                    range_files[future] = key
+                    parsing.add(future)
+                    # Backpressure: keep a bounded amount of parsed text in memory.
+                    await drain(parsing, self.workers * 2)
+                    await drain(embedding, self.embed_concurrency * 2)
+
+            await drain(parsing, 0)
+        flush(force=True)
+        await drain(embedding, 0)
+
+        removed = [
+            key
+            for key in self.manifest.files
+            if key not in seen and (self.prune or not os.path.exists(key))
+        ]
+        for key in removed:
+            stale_ids.extend(self.manifest.chunk_ids(key))
+            del self.manifest.files[key]
+        if stale_ids:
+            await self.sink.delete(stale_ids)
+            stats.deleted_chunks = len(stale_ids)
+
+        self.sink.close()
+        # Only record progress once every upsert and delete has gone through.
+        self.manifest.save()
+
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+
+def build_sink(backend: str, namespace: str, dtype: str = "float32", lexical: bool = True):
+    if backend == "local":
+        sink = LocalIndexSink(
+            os.path.join(settings.LOCAL_INDEX_DIR, namespace), settings.EMBEDDING_DIM, dtype
+        )
+    else:
+        from pinecone import Pinecone
+
+        settings.require("PINECONE_API_KEY", "PINECONE_INDEX_NAME")
+        pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+        sink = PineconeSink(pc.Index(settings.PINECONE_INDEX_NAME), namespace)
+    if lexical:
+        sink = LexicalIndexSink(sink, os.path.join(settings.LEXICAL_INDEX_DIR, namespace))
+    return sink
+
+
+def main(argv: Optional[List[str]] = None):
+    from langchain_openai import OpenAIEmbeddings
+
+    parser = argparse.ArgumentParser(description="Ingest PDFs into a vector namespace.")
+    parser.add_argument("paths", nargs="+", help="PDF files or directories")
+    parser.add_argument("--namespace", required=True)
+    parser.add_argument("--backend", choices=["pinecone", "local"], default=settings.VECTOR_BACKEND)
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help="Manifest path for incremental runs (default: INGEST_MANIFEST_DIR/<namespace>.json)",
+    )
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-embed everything")
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Also delete vectors for manifest files not among this run's inputs",
+    )
+    parser.add_argument("--dtype", choices=["float32", "float16", "int8"], default="float32")
+    parser.add_argument(
+        "--no-lexical",
+        action="store_true",
+        help="Skip the BM25 index under LEXICAL_INDEX_DIR used for hybrid search",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--embed-batch-size", type=int, default=256)
+    parser.add_argument("--embed-concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    embeddings = OpenAIEmbeddings(
+        openai_api_key=settings.OPENAI_API_KEY,
+        model=settings.EMBEDDING_MODEL,
+        dimensions=settings.EMBEDDING_DIM,
+    )
+    manifest_path = args.manifest or os.path.join(
+        settings.INGEST_MANIFEST_DIR, f"{args.namespace}.json"
+    )
+    pipeline = IngestionPipeline(
+        embeddings,
+        build_sink(args.backend, args.namespace, args.dtype, lexical=not args.no_lexical),
+        manifest=IngestManifest(manifest_path),
+        force=args.full,
+        prune=args.prune,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        embed_batch_size=args.embed_batch_size,
+        embed_concurrency=args.embed_concurrency,
+    )
+    stats = asyncio.run(pipeline.run(discover_pdfs(args.paths)))
+    logger.info("Ingested %s into %s", stats.summary(), args.namespace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to was what when "
+    "which who why with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25 inverted index for one namespace.
+
+    Postings are stored CSR-style: ``offsets[t]:offsets[t + 1]`` slices
+    ``doc_ids`` and ``impacts`` for term ``t``. Each impact is the BM25
+    term-frequency component, precomputed at build time, so a query is one
+    vectorised multiply-add per query term. On disk a namespace is a
+    directory of ``.npy`` arrays, which ``load`` memory-maps, plus
+    ``lexicon.json`` and ``docs.json``.
+
+    Documents can be added or deleted; the postings are rebuilt on the next
+    search or save, because BM25 length normalisation depends on the whole
+    corpus.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict] = []
+        self._positions: Dict[str, int] = {}
+        self.terms: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.empty(0, dtype=np.int32)
+        self.impacts = np.empty(0, dtype=np.float32)
+        self.idf = np.empty(0, dtype=np.float32)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[Dict]):
+        """Insert or replace documents."""
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            position = self._positions.get(doc_id)
+            if position is None:
+                self._positions[doc_id] = len(self.ids)
+                self.ids.append(doc_id)
+                self.texts.append(text)
+                self.metadatas.append(dict(metadata))
+            else:
+                self.texts[position] = text
+                self.metadatas[position] = dict(metadata)
+        self._dirty = True
+
+    def delete(self, ids: Sequence[str]):
+        drop = {self._positions[doc_id] for doc_id in ids if doc_id in self._positions}
+        if not drop:
+            return
+        keep = [i for i in range(len(self.ids)) if i not in drop]
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self._positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self._dirty = True
+
+    def _build(self):
+        term_counts = [Counter(tokenize(text)) for text in self.texts]
+        lengths = np.array([sum(c.values()) for c in term_counts], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        vocabulary = sorted(postings)
+        self.terms = {term: i for i, term in enumerate(vocabulary)}
+        sizes = np.array([len(postings[t]) for t in vocabulary], dtype=np.int64)
+        self.offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.offsets[1:])
+
+        flat = [pair for term in vocabulary for pair in postings[term]]
+        self.doc_ids = np.array([doc for doc, _ in flat], dtype=np.int32)
+        tf = np.array([count for _, count in flat], dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths[self.doc_ids] / avg_length)
+        self.impacts = (tf * (self.k1 + 1) / (tf + norm)).astype(np.float32)
+
+        n = len(self.ids)
+        self.idf = np.log1p((n - sizes + 0.5) / (sizes + 0.5)).astype(np.float32)
+        self._dirty = False
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, BM25 scores) of the top ``k`` rows, best first."""
+        if self._dirty:
+            self._build()
+        term_ids = {self.terms[t] for t in tokenize(query) if t in self.terms}
+        if not term_ids or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for t in term_ids:
+            start, end = self.offsets[t], self.offsets[t + 1]
+            # Doc ids are unique within a posting list, so fancy-index += is exact.
+            scores[self.doc_ids[start:end]] += self.idf[t] * self.impacts[start:end]
+
+        candidates = np.flatnonzero(scores)
+        k = min(k, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def document(self, row: int) -> Document:
+        return Document(
+            id=self.ids[row],
+            page_content=self.texts[row],
+            metadata=dict(self.metadatas[row]),
+        )
+
+    def search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        rows, scores = self.search(query, k)
+        return [(self.document(int(row)), float(score)) for row, score in zip(rows, scores)]
+
+    def save(self, path: str):
+        if self._dirty:
+            self._build()
+        os.makedirs(path, exist_ok=True)
+        # Temporary names first so readers never see a half-written index.
+        arrays = {
+            "offsets": self.offsets,
+            "doc_ids": self.doc_ids,
+            "impacts": self.impacts,
+            "idf": self.idf,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.tmp.npy"), array)
+        documents = {"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}
+        lexicon = {"k1": self.k1, "b": self.b, "terms": sorted(self.terms, key=self.terms.get)}
+        for name, payload in (("docs", documents), ("lexicon", lexicon)):
+            with open(os.path.join(path, f"{name}.json.tmp"), "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+        for name in arrays:
+            os.replace(os.path.join(path, f"{name}.tmp.npy"), os.path.join(path, f"{name}.npy"))
+        for name in ("docs", "lexicon"):
+            os.replace(os.path.join(path, f"{name}.json.tmp"), os.path.join(path, f"{name}.json"))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "LexicalIndex":
+        """Load a saved namespace, or return an empty index if none exists."""
+        lexicon_path = os.path.join(path, "lexicon.json")
+        if not os.path.exists(lexicon_path):
+            return cls()
+        with open(lexicon_path, "r", encoding="utf-8") as f:
+            lexicon = json.load(f)
+        with open(os.path.join(path, "docs.json"), "r", encoding="utf-8") as f:
+            documents = json.load(f)
+
+        index = cls(k1=lexicon["k1"], b=lexicon["b"])
+        index.ids = documents["ids"]
+        index.texts = documents["texts"]
+        index.metadatas = documents["metadatas"]
+        index._positions = {doc_id: i for i, doc_id in enumerate(index.ids)}
+        index.terms = {term: i for i, term in enumerate(lexicon["terms"])}
+        mode = "r" if mmap else None
+        for name in ("offsets", "doc_ids", "impacts", "idf"):
+            setattr(index, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode))
+        return index
+
+
+def open_lexical_index(directory: Optional[str], namespace: str) -> Optional[LexicalIndex]:
+    """Load ``directory/namespace`` if it holds a non-empty index."""
+    if not directory:
+        return None
+    index = LexicalIndex.load(os.path.join(directory, namespace))
+    return index if len(index) else None
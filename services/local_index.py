@@ -0,0 +1,208 @@
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+_SUPPORTED_DTYPES = ("float32", "float16", "int8")
+_BLOCK_ROWS = 65_536
+
+
+class LocalVectorIndex:
+    """In-process vector index for one namespace.
+
+    Vectors are unit-normalised and stored row-wise, so cosine similarity is a
+    matrix-vector product. On disk a namespace is a directory holding
+    ``vectors.npy`` (float32, float16 or int8 with per-row ``scales.npy``) and
+    ``docs.json``; ``load`` memory-maps the matrix instead of reading it.
+    Exposes the same ``similarity_search_by_vector_with_score`` method the
+    retriever calls on PineconeVectorStore.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        vectors: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None,
+        ids: Optional[List[str]] = None,
+        texts: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict]] = None,
+    ):
+        self.dim = dim
+        self.vectors = vectors if vectors is not None else np.empty((0, dim), dtype=np.float32)
+        self.scales = scales
+        self.ids: List[str] = ids or []
+        self.texts: List[str] = texts or []
+        self.metadatas: List[Dict] = metadatas or []
+        self._positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, path: str, dim: int, mmap: bool = True) -> "LocalVectorIndex":
+        """Load a saved namespace, or return an empty index if none exists."""
+        vectors_path = os.path.join(path, "vectors.npy")
+        if not os.path.exists(vectors_path):
+            return cls(dim)
+
+        mode = "r" if mmap else None
+        vectors = np.load(vectors_path, mmap_mode=mode)
+        scales_path = os.path.join(path, "scales.npy")
+        scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        with open(os.path.join(path, "docs.json"), "r", encoding="utf-8") as f:
+            docs = json.load(f)
+        return cls(
+            vectors.shape[1],
+            vectors=vectors,
+            scales=scales,
+            ids=docs["ids"],
+            texts=docs["texts"],
+            metadatas=docs["metadatas"],
+        )
+
+    def save(self, path: str, dtype: str = "float32"):
+        if dtype not in _SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported index dtype: {dtype}")
+        os.makedirs(path, exist_ok=True)
+
+        matrix = self._dense()
+        scales_path = os.path.join(path, "scales.npy")
+        if dtype == "int8":
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            stored = np.round(matrix / scales[:, None]).astype(np.int8)
+            np.save(scales_path, scales.astype(np.float32))
+        else:
+            stored = matrix.astype(dtype)
+            if os.path.exists(scales_path):
+                os.remove(scales_path)
+
+        # Write to temporary names first so readers never see a half-written index.
+        tmp_vectors = os.path.join(path, "vectors.tmp.npy")
+        np.save(tmp_vectors, stored)
+        tmp_docs = os.path.join(path, "docs.json.tmp")
+        with open(tmp_docs, "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f)
+        os.replace(tmp_vectors, os.path.join(path, "vectors.npy"))
+        os.replace(tmp_docs, os.path.join(path, "docs.json"))
+
+    def _dense(self) -> np.ndarray:
+        matrix = np.asarray(self.vectors, dtype=np.float32)
+        if self.scales is not None:
+            matrix = matrix * self.scales[:, None]
+        return matrix
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        texts: Sequence[str],
+        metadatas: Sequence[Dict],
+    ):
+        """Insert or replace documents. Works on an in-memory float32 copy."""
+        new = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        matrix = self._dense()
+        self.scales = None
+
+        appended = []
+        for row, doc_id in enumerate(ids):
+            position = self._positions.get(doc_id)
+            if position is None:
+                appended.append(row)
+                continue
+            if not matrix.flags.writeable:
+                matrix = matrix.copy()
+            matrix[position] = new[row]
+            self.texts[position] = texts[row]
+            self.metadatas[position] = dict(metadatas[row])
+
+        if appended:
+            matrix = np.vstack([matrix, new[appended]])
+            for row in appended:
+                self._positions[ids[row]] = len(self.ids)
+                self.ids.append(ids[row])
+                self.texts.append(texts[row])
+                self.metadatas.append(dict(metadatas[row]))
+        self.vectors = matrix
+
+    def delete(self, ids: Sequence[str]):
+        drop = {self._positions[doc_id] for doc_id in ids if doc_id in self._positions}
+        if not drop:
+            return
+        keep = np.array([i for i in range(len(self.ids)) if i not in drop], dtype=np.int64)
+        self.vectors = self._dense()[keep]
+        self.scales = None
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self._positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+
+    def scores(self, embedding: Sequence[float]) -> np.ndarray:
+        """Cosine similarity of every stored vector to ``embedding``."""
+        query = self._normalize(np.asarray(embedding, dtype=np.float32))
+        if self.vectors.dtype == np.float32:
+            scores = self.vectors @ query
+        else:
+            # Upcast block by block so float16/int8 indexes never materialise
+            # a full float32 copy.
+            scores = np.empty(len(self.ids), dtype=np.float32)
+            for start in range(0, len(self.ids), _BLOCK_ROWS):
+                block = self.vectors[start : start + _BLOCK_ROWS].astype(np.float32)
+                scores[start : start + len(block)] = block @ query
+        if self.scales is not None:
+            scores = scores * self.scales
+        return scores
+
+    def search(self, embedding: Sequence[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, scores) of the top ``k`` rows, best first."""
+        if not self.ids or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.scores(embedding)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def document(self, row: int) -> Document:
+        return Document(
+            id=self.ids[row],
+            page_content=self.texts[row],
+            metadata=dict(self.metadatas[row]),
+        )
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: Sequence[float], k: int = 4, **kwargs
+    ) -> List[Tuple[Document, float]]:
+        rows, scores = self.search(embedding, k)
+        return [(self.document(int(row)), float(score)) for row, score in zip(rows, scores)]
+
+    def similarity_search_with_vectors(
+        self, embedding: Sequence[float], k: int = 4
+    ) -> Tuple[List[Tuple[Document, float]], np.ndarray]:
+        """Like similarity_search_by_vector_with_score, plus the matched rows' vectors."""
+        rows, scores = self.search(embedding, k)
+        vectors = self.vectors[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors = vectors * self.scales[rows, None]
+        matches = [(self.document(int(row)), float(score)) for row, score in zip(rows, scores)]
+        return matches, vectors
+
+    def centroid(self) -> Optional[np.ndarray]:
+        """Mean of the stored unit vectors, or None for an empty index."""
+        if not self.ids:
+            return None
+        total = np.zeros(self.dim, dtype=np.float64)
+        for start in range(0, len(self.ids), _BLOCK_ROWS):
+            block = self.vectors[start : start + _BLOCK_ROWS].astype(np.float32)
+            if self.scales is not None:
+                block = block * self.scales[start : start + _BLOCK_ROWS, None]
+            total += block.sum(axis=0)
+        return (total / len(self.ids)).astype(np.float32)
@@ -0,0 +1,59 @@
+import heapq
+import re
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import xxhash
+from langchain_core.documents import Document
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _content_fingerprint(text: str) -> int:
+    # Case and whitespace differences between overlapping PDFs should not
+    # defeat deduplication.
+    normalized = _WHITESPACE_RE.sub(" ", text).strip().lower()
+    return xxhash.xxh3_64_intdigest(normalized)
+
+
+def merge_matches(
+    matches: Iterable[Tuple[Document, float]], top_k: int
+) -> List[Document]:
+    """Pick the global top_k matches by score, dropping duplicate chunks.
+
+    Each returned document carries its similarity score in metadata["score"].
+    """
+    heap = [(-score, i, doc) for i, (doc, score) in enumerate(matches)]
+    heapq.heapify(heap)
+
+    seen = set()
+    merged: List[Document] = []
+    while heap and len(merged) < top_k:
+        neg_score, _, doc = heapq.heappop(heap)
+        fingerprint = _content_fingerprint(doc.page_content)
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        doc.metadata["score"] = -neg_score
+        merged.append(doc)
+    return merged
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Tuple[Document, float]]], k: int = 60
+) -> List[Tuple[Document, float]]:
+    """Fuse ranked lists by summing 1 / (k + rank) for each document.
+
+    Only ranks are used, so BM25 and cosine scores need no calibration.
+    Documents are matched by id, falling back to their content fingerprint.
+    Returns (document, fused score) pairs, best first.
+    """
+    fused: Dict[object, List] = {}
+    for ranking in rankings:
+        for rank, (doc, _) in enumerate(ranking, start=1):
+            key = doc.id or _content_fingerprint(doc.page_content)
+            entry = fused.get(key)
+            if entry is None:
+                fused[key] = [doc, 1.0 / (k + rank)]
+            else:
+                entry[1] += 1.0 / (k + rank)
+    return sorted(((doc, score) for doc, score in fused.values()), key=lambda pair: -pair[1])
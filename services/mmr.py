@@ -0,0 +1,43 @@
+from typing import Sequence
+
+import numpy as np
+
+
+def maximal_marginal_relevance(
+    query_embedding: Sequence[float],
+    embeddings: Sequence[Sequence[float]],
+    k: int,
+    lambda_mult: float = 0.5,
+) -> np.ndarray:
+    """Return the indices of ``k`` embeddings chosen by MMR, in pick order.
+
+    Each pick maximises ``lambda_mult * sim(query, c) - (1 - lambda_mult) *
+    max sim(c, picked)`` over cosine similarities, so 1.0 ranks purely by
+    relevance and lower values trade relevance for diversity. A pick costs
+    one matrix-vector product (the new pick against every candidate) and a
+    vector ``maximum`` to update the running redundancy, which is cheaper
+    than the full candidate-candidate matrix since k < len(embeddings).
+    """
+    candidates = np.asarray(embeddings, dtype=np.float32)
+    k = min(k, len(candidates))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Divide the dot products by the norms rather than normalising the
+    # candidate matrix, which would copy it.
+    norms = np.sqrt(np.einsum("ij,ij->i", candidates, candidates))
+    norms[norms == 0] = 1.0
+    query = np.asarray(query_embedding, dtype=np.float32)
+    relevance = lambda_mult * (candidates @ query) / (norms * (np.linalg.norm(query) or 1.0))
+    redundancy = np.zeros(len(candidates), dtype=np.float32)
+    picked = np.zeros(len(candidates), dtype=bool)
+    selected = np.empty(k, dtype=np.int64)
+    for step in range(k):
+        scores = relevance - redundancy
+        scores[picked] = -np.inf
+        best = int(np.argmax(scores))
+        selected[step] = best
+        picked[best] = True
+        similarity = (candidates @ candidates[best]) / (norms * norms[best])
+        np.maximum(redundancy, (1 - lambda_mult) * similarity, out=redundancy)
+    return selected
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Probe = Callable[[], Awaitable[object]]
+
+
+@dataclass
+class ProbeResult:
+    ok: bool = False
+    latency_ms: Optional[float] = None
+    checked_at: Optional[float] = None  # unix time of the last attempt
+    error: Optional[str] = None
+
+
+class DependencyProbes:
+    """Check downstream dependencies in the background and cache the results.
+
+    Every ``interval`` seconds all probes run concurrently, each bounded by
+    ``timeout``. ``/ready`` only reads the cached results, so readiness
+    checks never add load on Pinecone or OpenAI. A result older than three
+    intervals counts as failed, so a stuck refresh loop cannot report
+    ready forever.
+    """
+
+    def __init__(self, probes: Dict[str, Probe], interval: float = 15.0, timeout: float = 5.0):
+        self.probes = probes
+        self.interval = interval
+        self.timeout = timeout
+        self.results: Dict[str, ProbeResult] = {name: ProbeResult() for name in probes}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _check(self, name: str, probe: Probe):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe(), timeout=self.timeout)
+            error = None
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.timeout:g}s"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        result = ProbeResult(
+            ok=error is None,
+            latency_ms=round((time.perf_counter() - started) * 1000, 1),
+            checked_at=time.time(),
+            error=error,
+        )
+        previous = self.results[name]
+        if error and (previous.ok or previous.checked_at is None):
+            logger.warning("Dependency probe %s failed: %s", name, error)
+        self.results[name] = result
+
+    async def run_once(self):
+        await asyncio.gather(*(self._check(name, probe) for name, probe in self.probes.items()))
+
+    async def _loop(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def ready(self) -> bool:
+        now = time.time()
+        return all(
+            result.ok and result.checked_at is not None and now - result.checked_at < 3 * self.interval
+            for result in self.results.values()
+        )
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {name: asdict(result) for name, result in self.results.items()}
+
+
+def build_probes(service) -> Dict[str, Probe]:
+    """Probes for the clients a RAGService uses.
+
+    Pinecone is checked with describe_index_stats on the shared index; the
+    chat and embedding models with a models.retrieve call, which costs no
+    tokens.
+    """
+    probes: Dict[str, Probe] = {}
+    index = getattr(service.retriever, "index", None)
+    if index is not None:
+        probes["pinecone"] = lambda: asyncio.to_thread(index.describe_index_stats)
+
+    client = getattr(service.llm, "root_async_client", None)
+    if client is not None:
+        probes["llm"] = lambda: client.models.retrieve(settings.LLM_MODEL)
+        probes["embeddings"] = lambda: client.models.retrieve(settings.EMBEDDING_MODEL)
+    return probes
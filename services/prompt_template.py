@@ -1,4 +1,3 @@
-import markdown
 from langchain_core.prompts import ChatPromptTemplate
 
 
@@ -45,6 +44,8 @@ Provide your answer now:"""
 
 def render_markdown_response(markdown_text: str) -> str:
     """Convert markdown text to HTML for proper rendering."""
+    import markdown
+
     html_output = markdown.markdown(
         markdown_text,
         extensions=['fenced_code', 'codehilite', 'tables', 'nl2br']
@@ -1,11 +1,52 @@
-from typing import Dict, List, AsyncIterator
+import asyncio
+import re
+import time
+from typing import Dict, List, AsyncIterator, Optional, Sequence, Tuple
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable, RunnableLambda
 
 from config.settings import settings
+from services.context_packer import CONTEXT_SEPARATOR, ContextPacker, format_doc
 from services.prompt_template import get_prompt
 from services.retriever import MultiNamespaceRetriever
-from utils.cache import SimpleCache
+from services.router import CHITCHAT, OUT_OF_DOMAIN, QueryRouter, build_router
+from utils import metrics
+from utils.cache import build_cache
+from utils.logger import get_logger
+from utils.semantic_cache import SemanticCache
+from utils.singleflight import SingleFlight
+
+logger = get_logger(__name__)
+
+_ANSWER_HITS = metrics.CACHE_REQUESTS.labels("answer", "hit")
+_ANSWER_MISSES = metrics.CACHE_REQUESTS.labels("answer", "miss")
+_SEMANTIC_HITS = metrics.CACHE_REQUESTS.labels("semantic", "hit")
+_SEMANTIC_MISSES = metrics.CACHE_REQUESTS.labels("semantic", "miss")
+_TTFT_SECONDS = metrics.STAGE_SECONDS.labels("ttft")
+_GENERATE_SECONDS = metrics.STAGE_SECONDS.labels("generate")
+_TOTAL_SECONDS = metrics.STAGE_SECONDS.labels("total")
+_TOKENS_IN = metrics.LLM_TOKENS.labels("in")
+_TOKENS_OUT = metrics.LLM_TOKENS.labels("out")
+_GENERATIONS_CANCELLED = metrics.GENERATIONS_CANCELLED.labels()
+_ROUTES = {
+    route: metrics.ROUTES.labels(route)
+    for route in ("greeting", CHITCHAT, OUT_OF_DOMAIN, "namespace", "fanout")
+}
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_GREETINGS = frozenset(
+    {"hi", "hii", "hello", "hey", "greetings", "good morning", "good afternoon", "good evening", "hi there", "hello there"}
+)
+_GREETING_RESPONSE = "Hello! I am your AI assistant. How can I help you today?"
+_CHITCHAT_RESPONSE = (
+    "I'm your AI assistant for Computer Networks and DSA. What would you like to know?"
+)
+# Same wording the prompt tells the LLM to use for questions it cannot answer.
+_OUT_OF_DOMAIN_RESPONSE = (
+    "I don't have information about this topic in my knowledge base. "
+    "Please ask questions related to DSA or Computer Networks."
+)
 
 
 class RAGService:
@@ -13,6 +54,7 @@ class RAGService:
 
     def __init__(self, namespaces: List[str] | None = None):
         self.namespaces = namespaces or ["default"]
+        settings.require("OPENAI_API_KEY")
         self.embeddings = OpenAIEmbeddings(
             openai_api_key=settings.OPENAI_API_KEY,
             model=settings.EMBEDDING_MODEL,
@@ -27,138 +69,362 @@ class RAGService:
         )
         self.prompt = get_prompt()
         self.parser = StrOutputParser()
-        self.cache = SimpleCache(max_size=128, ttl_seconds=600)
+        self.chain = self._build_chain()
+        self.packer = ContextPacker(settings.CONTEXT_MAX_TOKENS, settings.LLM_MODEL)
+        self.cache = build_cache(
+            settings.CACHE_BACKEND,
+            "answers",
+            max_size=settings.CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.CACHE_TTL_SECONDS,
+            max_bytes=settings.CACHE_MAX_BYTES,
+            directory=settings.CACHE_DIR,
+        )
+        self.semantic_cache = (
+            SemanticCache(
+                self.cache,
+                threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            )
+            if settings.SEMANTIC_CACHE_ENABLED
+            else None
+        )
+        self.inflight = SingleFlight()
+        self.router: Optional[QueryRouter] = None
+
+    async def load_router(self):
+        """Build the query router; until then every query is answered normally."""
+        if settings.ROUTER_ENABLED:
+            self.router = await build_router(self.retriever)
+
+    def _build_chain(self) -> Runnable:
+        """Compose the answer chain once; requests only supply the inputs.
+
+        Takes ``{"docs": [...], "question": str}``. The input mapping has an
+        async variant so astream does not hop to a thread executor for it.
+        """
+        return (
+            RunnableLambda(self._prompt_inputs, afunc=self._aprompt_inputs)
+            | self.prompt
+            | self.llm
+            | self.parser
+        )
+
+    def _prompt_inputs(self, inputs: Dict) -> Dict[str, str]:
+        return {"context": self._format_docs(inputs["docs"]), "question": inputs["question"]}
+
+    async def _aprompt_inputs(self, inputs: Dict) -> Dict[str, str]:
+        return self._prompt_inputs(inputs)
 
     def _format_docs(self, docs: List) -> str:
         if not docs:
             return "No relevant information found."
-        return "\n\n---\n\n".join(
-            [
-                f"[Source: {doc.metadata.get('source_namespace', 'unknown')}]\n{doc.page_content}"
-                for doc in docs
-            ]
-        )
+        return CONTEXT_SEPARATOR.join([format_doc(doc) for doc in docs])
 
     def _get_greeting_response(self, query: str) -> str | None:
-        normalized = query.strip().lower()
-        import re
-        normalized = re.sub(r'[^\w\s]', '', normalized)
-        if normalized in {"hi", "hii", "hello", "hey", "greetings", "good morning", "good afternoon", "good evening", "hi there", "hello there"}:
-            return "Hello! I am your AI assistant. How can I help you today?"
+        normalized = _PUNCTUATION_RE.sub("", query.strip().lower())
+        if normalized in _GREETINGS:
+            return _GREETING_RESPONSE
         return None
 
+    @staticmethod
+    def _cache_scope(
+        namespace: str, mmr_lambda: Optional[float] = None, fetch_k: Optional[int] = None
+    ) -> str:
+        """Cache partition for a request: MMR answers never mix with plain ones."""
+        if mmr_lambda is None:
+            return namespace
+        return f"{namespace}|mmr:{mmr_lambda:g}:{fetch_k or settings.MMR_FETCH_K}"
+
+    @staticmethod
+    async def _canned_events(answer: str, namespace: str) -> AsyncIterator[Dict]:
+        yield {"type": "sources", "sources": [], "namespace": namespace}
+        # Break the answer into words to simulate streaming token by token
+        for word in answer.split(" "):
+            yield {"type": "token", "content": word + " "}
+        yield {"type": "complete"}
+
+    async def _lookup_cache(
+        self,
+        cache_key: str,
+        query: str,
+        namespace: str,
+        embedding: Optional[List[float]] = None,
+    ) -> Tuple[Optional[Dict], Optional[List[float]]]:
+        """Return (cached answer, query embedding).
+
+        Exact matches are served without embedding the query. Otherwise the
+        query is embedded once; the vector is used for the semantic lookup and
+        handed back so retrieval does not embed it again. A precomputed
+        ``embedding`` (from a batch) skips the embedding call.
+        """
+        cached = self.cache.get(cache_key)
+        if cached or self.semantic_cache is None:
+            return cached, embedding
+
+        if embedding is None:
+            embedding = await self.retriever.aembed_query(query)
+        cached = self.semantic_cache.get(namespace, embedding)
+        (_SEMANTIC_HITS if cached else _SEMANTIC_MISSES).inc()
+        return cached, embedding
+
+    def _store_answer(
+        self, cache_key: str, namespace: str, embedding: Optional[List[float]], value: Dict
+    ):
+        self.cache.set(cache_key, value)
+        if self.semantic_cache is not None and embedding is not None:
+            self.semantic_cache.set(namespace, cache_key, embedding)
+
     async def query_stream(
-        self, query: str, namespace: str = "default", top_k: int = 5
+        self,
+        query: str,
+        namespace: str = "default",
+        top_k: int = 5,
+        embedding: Optional[List[float]] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
     ) -> AsyncIterator[Dict]:
-        """Stream the answer token by token."""
+        """Stream the answer token by token.
+
+        Concurrent requests for the same cache key share one in-flight
+        generation; each subscriber replays its events from the start.
+        Setting ``mmr_lambda`` diversifies the retrieved chunks with MMR over
+        ``fetch_k`` candidates.
+        """
         
         greeting_response = self._get_greeting_response(query)
         if greeting_response:
-            yield {"type": "sources", "sources": [], "namespace": namespace}
-            # Break greeting into words to simulate streaming token by token
-            for word in greeting_response.split(" "):
-                yield {"type": "token", "content": word + " "}
-            yield {"type": "complete"}
+            _ROUTES["greeting"].inc()
+            async for event in self._canned_events(greeting_response, namespace):
+                yield event
             return
 
-        cache_key = f"{namespace}:{query.strip()}"
+        cache_key = f"{self._cache_scope(namespace, mmr_lambda, fetch_k)}:{query.strip()}"
         cached = self.cache.get(cache_key)
+        if cached:
+            _ANSWER_HITS.inc()
+            yield {"type": "sources", "sources": cached["sources"], "namespace": namespace}
+            yield {"type": "token", "content": cached["answer"]}
+            yield {"type": "complete"}
+            return
+        _ANSWER_MISSES.inc()
+
+        events = self.inflight.stream(
+            cache_key,
+            lambda: self._generate(
+                cache_key, query, namespace, top_k, embedding, mmr_lambda, fetch_k
+            ),
+        )
+        try:
+            async for event in events:
+                yield event
+        finally:
+            # Unsubscribe right away when the caller stops early; the last
+            # subscriber leaving cancels the shared generation.
+            await events.aclose()
+
+    async def _generate(
+        self,
+        cache_key: str,
+        query: str,
+        namespace: str,
+        top_k: int,
+        embedding: Optional[List[float]] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+    ) -> AsyncIterator[Dict]:
+        started = time.perf_counter()
+        scope = self._cache_scope(namespace, mmr_lambda, fetch_k)
+        cached, embedding = await self._lookup_cache(cache_key, query, scope, embedding)
         if cached:
             yield {"type": "sources", "sources": cached["sources"], "namespace": namespace}
             yield {"type": "token", "content": cached["answer"]}
             yield {"type": "complete"}
             return
 
+        search_namespace = namespace
+        if self.router is not None:
+            if embedding is None:
+                embedding = await self.retriever.aembed_query(query)
+            route = self.router.route(embedding)
+            if route.intent in (CHITCHAT, OUT_OF_DOMAIN):
+                _ROUTES[route.intent].inc()
+                answer = _CHITCHAT_RESPONSE if route.intent == CHITCHAT else _OUT_OF_DOMAIN_RESPONSE
+                async for event in self._canned_events(answer, namespace):
+                    yield event
+                return
+            if route.namespace and namespace not in self.retriever.vectorstores:
+                # No explicit namespace was requested: search only the best match.
+                search_namespace = route.namespace
+            single = search_namespace in self.retriever.vectorstores
+            _ROUTES["namespace" if single else "fanout"].inc()
+
         # Get documents
-        docs = self.retriever.get_documents(query, namespace=namespace, top_k=top_k)
-        
+        retrieval = await self.retriever.aretrieve(
+            query,
+            namespace=search_namespace,
+            top_k=top_k,
+            embedding=embedding,
+            mmr_lambda=mmr_lambda,
+            fetch_k=fetch_k,
+        )
+        packed = self.packer.pack(retrieval.documents, preserve_order=mmr_lambda is not None)
+        docs = packed.docs
+        if packed.truncated or packed.dropped:
+            logger.debug(
+                "Context packed to %d tokens (%d chunks dropped, truncated=%s)",
+                packed.tokens,
+                packed.dropped,
+                packed.truncated,
+            )
+
         # Prepare sources
         sources = [
             {
                 "id": getattr(doc, "id", None),
-                "namespace": doc.metadata.get("source_namespace", namespace),
+                "namespace": doc.metadata.get("source_namespace", search_namespace),
                 "metadata": doc.metadata,
             }
             for doc in docs
         ]
         
         # Yield sources first
-        yield {"type": "sources", "sources": sources, "namespace": namespace}
-        
-        # Build chain
-        chain = (
-            {
-                "context": lambda x: self._format_docs(docs),
-                "question": lambda x: query,
-            }
-            | self.prompt
-            | self.llm
-            | self.parser
-        )
+        sources_event = {
+            "type": "sources",
+            "sources": sources,
+            "namespace": namespace,
+            "context_tokens": packed.tokens,
+        }
+        if retrieval.partial:
+            sources_event["skipped_namespaces"] = retrieval.skipped_namespaces
+        yield sources_event
         
         full_answer: List[str] = []
+        _TOKENS_IN.inc(packed.tokens + self.packer.count(query))
+        first_token_at = None
 
         # Stream the answer
-        async for chunk in chain.astream({}):
-            if chunk:  # Only yield non-empty chunks
-                yield {"type": "token", "content": chunk}
-                full_answer.append(chunk)
-        
+        try:
+            async for chunk in self.chain.astream({"docs": docs, "question": query}):
+                if chunk:  # Only yield non-empty chunks
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        _TTFT_SECONDS.observe(first_token_at - started)
+                    yield {"type": "token", "content": chunk}
+                    full_answer.append(chunk)
+        except asyncio.CancelledError:
+            # Every subscriber went away; cancelling astream closes the
+            # upstream HTTP stream so no more tokens are paid for.
+            _GENERATIONS_CANCELLED.inc()
+            logger.info("Cancelled generation for %r after %d chunks", cache_key, len(full_answer))
+            raise
+        finally:
+            # Streamed chunks are one token each for OpenAI chat models.
+            _TOKENS_OUT.inc(len(full_answer))
+
+        finished = time.perf_counter()
+        if first_token_at is not None:
+            _GENERATE_SECONDS.observe(finished - first_token_at)
+        _TOTAL_SECONDS.observe(finished - started)
+
+        # Cache full answer before signalling completion so requests arriving
+        # right after the stream closes hit the cache. An answer built from a
+        # partial retrieval is not cached, so a slow namespace does not pin a
+        # degraded answer for the whole TTL.
+        if not retrieval.partial:
+            self._store_answer(
+                cache_key,
+                scope,
+                embedding,
+                {"answer": "".join(full_answer), "sources": sources},
+            )
+
         # Yield completion signal
         yield {"type": "complete"}
 
-        # Cache full answer
-        self.cache.set(
-            cache_key,
-            {"answer": "".join(full_answer), "sources": sources},
-        )
-
-    async def query(self, query: str, namespace: str = "default", top_k: int = 5) -> Dict:
+    async def query(
+        self,
+        query: str,
+        namespace: str = "default",
+        top_k: int = 5,
+        embedding: Optional[List[float]] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+    ) -> Dict:
         """Non-streaming version for backward compatibility."""
         greeting_response = self._get_greeting_response(query)
         if greeting_response:
+            _ROUTES["greeting"].inc()
             return {
                 "answer": greeting_response,
                 "sources": [],
                 "namespace": namespace,
             }
 
-        cache_key = f"{namespace}:{query.strip()}"
-        cached = self.cache.get(cache_key)
-        if cached:
-            return {
-                "answer": cached["answer"],
-                "sources": cached["sources"],
-                "namespace": namespace,
-            }
+        sources: List = []
+        answer: List[str] = []
+        async for event in self.query_stream(
+            query,
+            namespace=namespace,
+            top_k=top_k,
+            embedding=embedding,
+            mmr_lambda=mmr_lambda,
+            fetch_k=fetch_k,
+        ):
+            if event["type"] == "sources":
+                sources = event["sources"]
+            elif event["type"] == "token":
+                answer.append(event["content"])
 
-        docs = self.retriever.get_documents(query, namespace=namespace, top_k=top_k)
-        
-        chain = (
-            {
-                "context": lambda x: self._format_docs(docs),
-                "question": lambda x: query,
-            }
-            | self.prompt
-            | self.llm
-            | self.parser
-        )
-        
-        # Collect all chunks
-        answer = ""
-        async for chunk in chain.astream({}):
-            answer += chunk
-        
-        sources = [
-            {
-                "id": getattr(doc, "id", None),
-                "namespace": doc.metadata.get("source_namespace", namespace),
-                "metadata": doc.metadata,
-            }
-            for doc in docs
+        return {"answer": "".join(answer), "sources": sources, "namespace": namespace}
+
+    async def query_batch(
+        self,
+        questions: Sequence[str],
+        namespace: str = "default",
+        top_k: int = 5,
+        max_concurrency: Optional[int] = None,
+    ) -> AsyncIterator[Dict]:
+        """Answer many questions, yielding each result as soon as it is ready.
+
+        Repeated questions are answered once. All uncached questions are
+        embedded in one batched call up front; retrieval and generation then
+        run with at most ``max_concurrency`` questions in flight. Each result
+        carries the ``indices`` of the input questions it answers; a failed
+        question yields an ``error`` instead of failing the batch.
+        """
+        indices: Dict[str, List[int]] = {}
+        for i, question in enumerate(questions):
+            indices.setdefault(question.strip(), []).append(i)
+        unique = list(indices)
+
+        pending = [
+            q
+            for q in unique
+            if not self._get_greeting_response(q) and not self.cache.get(f"{namespace}:{q}")
         ]
-        
-        # Cache answer
-        self.cache.set(cache_key, {"answer": answer, "sources": sources})
+        embeddings = dict(zip(pending, await self.retriever.aembed_queries(pending)))
+
+        semaphore = asyncio.Semaphore(max_concurrency or settings.BATCH_MAX_CONCURRENCY)
+
+        async def answer(question: str) -> Dict:
+            async with semaphore:
+                try:
+                    result = await self.query(
+                        question,
+                        namespace=namespace,
+                        top_k=top_k,
+                        embedding=embeddings.get(question),
+                    )
+                except Exception as e:
+                    logger.error("Batch question failed: %s", e)
+                    result = {"error": str(e), "namespace": namespace}
+            return {"indices": indices[question], "question": question, **result}
 
-        return {"answer": answer, "sources": sources, "namespace": namespace}
+        tasks = [asyncio.ensure_future(answer(question)) for question in unique]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,43 +1,434 @@
-from typing import Dict, List, Optional
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone, ServerlessSpec
+import numpy as np
+from langchain_core.documents import Document
 
 from config.settings import settings
+from services.lexical_index import LexicalIndex, open_lexical_index
+from services.local_index import LocalVectorIndex
+from services.merge import merge_matches, reciprocal_rank_fusion
+from services.mmr import maximal_marginal_relevance
+from utils import metrics
+from utils.cache import build_cache
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_HYBRID_DEPTH_FACTOR = 2
+
+_EMBED_SECONDS = metrics.STAGE_SECONDS.labels("embed")
+_SEARCH_SECONDS = metrics.STAGE_SECONDS.labels("search")
+_RETRIEVE_SECONDS = metrics.STAGE_SECONDS.labels("retrieve")
+_LEXICAL_SECONDS = metrics.STAGE_SECONDS.labels("lexical")
+_MMR_SECONDS = metrics.STAGE_SECONDS.labels("mmr")
+_EMBEDDING_HITS = metrics.CACHE_REQUESTS.labels("embedding", "hit")
+_EMBEDDING_MISSES = metrics.CACHE_REQUESTS.labels("embedding", "miss")
+_NAMESPACE_ERRORS = metrics.NAMESPACE_ERRORS.labels()
+
+
+@dataclass
+class Retrieval:
+    documents: List[Document]
+    # Namespaces left out of a fan-out because their search failed or timed out.
+    skipped_namespaces: List[str] = field(default_factory=list)
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.skipped_namespaces)
 
 
 class MultiNamespaceRetriever:
-    """Wrapper to search across one or multiple Pinecone namespaces."""
+    """Wrapper to search across one or multiple namespaces.
+
+    Namespaces live in Pinecone or, with VECTOR_BACKEND="local", in
+    LocalVectorIndex directories under LOCAL_INDEX_DIR. Namespaces with a
+    BM25 index under LEXICAL_INDEX_DIR are searched both ways and the two
+    rankings fused with reciprocal rank fusion.
+    """
 
     def __init__(
         self,
         namespaces: List[str],
         embeddings,
+        backend: Optional[str] = None,
+        index_dir: Optional[str] = None,
+        lexical_dir: Optional[str] = None,
     ):
-        pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        self.index = pc.Index(settings.PINECONE_INDEX_NAME)
-        self.vectorstores: Dict[str, PineconeVectorStore] = {
-            ns: PineconeVectorStore(
-                index=self.index,
-                embedding=embeddings,
-                namespace=ns,
-            )
-            for ns in namespaces
-        }
+        self.backend = backend or settings.VECTOR_BACKEND
+        self.index_dir = index_dir or settings.LOCAL_INDEX_DIR
+        self.embeddings = embeddings
+        if self.backend == "pinecone":
+            from langchain_pinecone import PineconeVectorStore
+            from pinecone import Pinecone
+
+            settings.require("PINECONE_API_KEY", "PINECONE_INDEX_NAME", "PINECONE_ENVIRONMENT")
+            pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+            self.index = pc.Index(settings.PINECONE_INDEX_NAME)
+            self.vectorstores: Dict[str, Any] = {
+                ns: PineconeVectorStore(
+                    index=self.index,
+                    embedding=embeddings,
+                    namespace=ns,
+                )
+                for ns in namespaces
+            }
+        elif self.backend == "local":
+            self.index = None
+            self.vectorstores = {
+                ns: LocalVectorIndex.load(
+                    os.path.join(self.index_dir, ns), dim=settings.EMBEDDING_DIM
+                )
+                for ns in namespaces
+            }
+        else:
+            raise ValueError(f"Unknown vector backend: {self.backend}")
+        self.lexical_indexes: Dict[str, LexicalIndex] = {}
+        if settings.HYBRID_SEARCH_ENABLED:
+            for ns in namespaces:
+                lexical = open_lexical_index(lexical_dir or settings.LEXICAL_INDEX_DIR, ns)
+                if lexical is not None:
+                    self.lexical_indexes[ns] = lexical
+        self.rrf_k = settings.HYBRID_RRF_K
+        self.max_concurrency = settings.RETRIEVAL_MAX_CONCURRENCY
+        self.namespace_timeout = settings.RETRIEVAL_NAMESPACE_TIMEOUT
+        self._semaphore: asyncio.Semaphore | None = None
+        # Searches run on a pool of their own: a search that outlives its
+        # timeout keeps its slot until it returns, so hung calls can never
+        # exceed max_concurrency threads or starve the default executor.
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="retriever"
+        )
+        self.embedding_cache = build_cache(
+            settings.CACHE_BACKEND,
+            "embeddings",
+            max_size=settings.EMBEDDING_CACHE_SIZE,
+            directory=settings.CACHE_DIR,
+        )
+
+    def _embedding_key(self, query: str) -> str:
+        return f"{settings.EMBEDDING_MODEL}:{settings.EMBEDDING_DIM}:{query.strip()}"
+
+    def embed_query(self, query: str) -> List[float]:
+        key = self._embedding_key(query)
+        vector = self.embedding_cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            self.embedding_cache.set(key, vector)
+        return vector
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """Embed a query once, reusing the cached vector for repeated questions."""
+        key = self._embedding_key(query)
+        vector = self.embedding_cache.get(key)
+        if vector is not None:
+            _EMBEDDING_HITS.inc()
+            return vector
+        _EMBEDDING_MISSES.inc()
+        started = time.perf_counter()
+        vector = await self.embeddings.aembed_query(query)
+        _EMBED_SECONDS.observe(time.perf_counter() - started)
+        self.embedding_cache.set(key, vector)
+        return vector
+
+    async def aembed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """Embed many queries with one batched embeddings call for the cache misses."""
+        keys = [self._embedding_key(query) for query in queries]
+        vectors = [self.embedding_cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        _EMBEDDING_HITS.inc(len(vectors) - len(missing))
+        _EMBEDDING_MISSES.inc(len(missing))
+        if missing:
+            started = time.perf_counter()
+            fresh = await self.embeddings.aembed_documents([queries[i] for i in missing])
+            _EMBED_SECONDS.observe(time.perf_counter() - started)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+                self.embedding_cache.set(keys[i], vector)
+        return vectors
+
+    async def namespace_centroids(self, sample_size: int = 500) -> Dict[str, np.ndarray]:
+        """Mean chunk vector per namespace, for query routing.
+
+        Local indexes average every stored vector. For Pinecone, up to
+        ``sample_size`` ids spread over the namespace's lexical index are
+        fetched with their values; namespaces without a lexical index (and
+        so without known ids) are left out.
+        """
+        centroids: Dict[str, np.ndarray] = {}
+        for ns, store in self.vectorstores.items():
+            if isinstance(store, LocalVectorIndex):
+                centroid = await asyncio.to_thread(store.centroid)
+            elif ns in self.lexical_indexes:
+                ids = self.lexical_indexes[ns].ids
+                step = max(1, len(ids) // sample_size)
+                centroid = await asyncio.to_thread(
+                    _pinecone_centroid, self.index, ns, ids[::step][:sample_size]
+                )
+            else:
+                centroid = None
+            if centroid is not None:
+                centroids[ns] = centroid
+        return centroids
 
     def get_documents(
         self, query: str, namespace: Optional[str] = None, top_k: int = 5
     ) -> List:
+        vector = self.embed_query(query)
+        depth = self._dense_depth(top_k)
+
         # If a namespace is provided, search only there when available.
         if namespace and namespace in self.vectorstores:
-            return self.vectorstores[namespace].similarity_search(query, k=top_k)
+            matches = self.vectorstores[namespace].similarity_search_by_vector_with_score(
+                vector, k=depth
+            )
+            return merge_matches(self._fuse(namespace, query, matches, top_k), top_k)
 
         # Otherwise search across all configured namespaces.
-        results: List = []
+        results: List[Tuple[Document, float]] = []
         for ns, store in self.vectorstores.items():
-            docs = store.similarity_search(query, k=top_k)
-            for doc in docs:
+            matches = store.similarity_search_by_vector_with_score(vector, k=depth)
+            matches = self._fuse(ns, query, matches, top_k)
+            for doc, _ in matches:
                 doc.metadata["source_namespace"] = ns
-            results.extend(docs)
-        return results
+            results.extend(matches)
+        return merge_matches(results, top_k)
+
+    async def aget_documents(
+        self,
+        query: str,
+        namespace: Optional[str] = None,
+        top_k: int = 5,
+        embedding: Optional[List[float]] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+    ) -> List:
+        """Async variant of get_documents; see aretrieve."""
+        retrieval = await self.aretrieve(
+            query,
+            namespace=namespace,
+            top_k=top_k,
+            embedding=embedding,
+            mmr_lambda=mmr_lambda,
+            fetch_k=fetch_k,
+        )
+        return retrieval.documents
+
+    async def aretrieve(
+        self,
+        query: str,
+        namespace: Optional[str] = None,
+        top_k: int = 5,
+        embedding: Optional[List[float]] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+    ) -> Retrieval:
+        """Retrieve documents without blocking the event loop.
+
+        The query is embedded once and every namespace is searched by vector;
+        matches are merged into a single score-ordered, deduplicated top_k.
+        Namespaces are searched concurrently (bounded by
+        RETRIEVAL_MAX_CONCURRENCY) with a per-namespace timeout. When fanning
+        out, a namespace that fails or times out is skipped so the others
+        still produce a partial result, flagged in ``skipped_namespaces``.
+        Pass ``embedding`` when the caller already embedded the query.
+
+        With ``mmr_lambda`` set, ``fetch_k`` candidates per namespace are
+        fetched with their vectors and top_k of them picked by maximal
+        marginal relevance instead (vector search only, no BM25 fusion).
+        """
+        vector = embedding if embedding is not None else await self.aembed_query(query)
+
+        started = time.perf_counter()
+        try:
+            if mmr_lambda is not None:
+                return await self._search_mmr(
+                    vector, namespace, top_k, max(fetch_k or settings.MMR_FETCH_K, top_k), mmr_lambda
+                )
+            return await self._search(query, vector, namespace, top_k)
+        finally:
+            _RETRIEVE_SECONDS.observe(time.perf_counter() - started)
+
+    def _dense_depth(self, top_k: int) -> int:
+        # Fusion needs candidates beyond top_k from each side to reorder.
+        return top_k * _HYBRID_DEPTH_FACTOR if self.lexical_indexes else top_k
+
+    def _fuse(
+        self, namespace: str, query: str, dense: List[Tuple[Document, float]], top_k: int
+    ) -> List[Tuple[Document, float]]:
+        """Fuse dense matches with BM25 matches for ``namespace``.
+
+        Once any namespace is hybrid, every namespace's matches go through
+        fusion (with an empty lexical list if it has no BM25 index) so
+        scores stay comparable when results are merged across namespaces.
+        """
+        if not self.lexical_indexes:
+            return dense
+        lexical = self.lexical_indexes.get(namespace)
+        sparse: List[Tuple[Document, float]] = []
+        if lexical is not None:
+            started = time.perf_counter()
+            sparse = lexical.search_with_score(query, self._dense_depth(top_k))
+            _LEXICAL_SECONDS.observe(time.perf_counter() - started)
+        return reciprocal_rank_fusion([dense, sparse], k=self.rrf_k)[: self._dense_depth(top_k)]
+
+    async def _namespace_matches(
+        self, namespace: str, query: str, vector: List[float], top_k: int
+    ) -> List[Tuple[Document, float]]:
+        dense = await self._search_namespace(namespace, vector, self._dense_depth(top_k))
+        return self._fuse(namespace, query, dense, top_k)
+
+    async def _search(
+        self, query: str, vector: List[float], namespace: Optional[str], top_k: int
+    ) -> Retrieval:
+        if namespace and namespace in self.vectorstores:
+            matches = await self._namespace_matches(namespace, query, vector, top_k)
+            return Retrieval(merge_matches(matches, top_k))
+
+        per_namespace = await asyncio.gather(
+            *(self._namespace_matches(ns, query, vector, top_k) for ns in self.vectorstores),
+            return_exceptions=True,
+        )
+        results: List[Tuple[Document, float]] = []
+        skipped: List[str] = []
+        for ns, matches in zip(self.vectorstores, per_namespace):
+            if isinstance(matches, BaseException):
+                logger.warning("Skipping namespace %s: %r", ns, matches)
+                skipped.append(ns)
+                continue
+            for doc, _ in matches:
+                doc.metadata["source_namespace"] = ns
+            results.extend(matches)
+        return Retrieval(merge_matches(results, top_k), skipped)
+
+    async def _search_mmr(
+        self,
+        vector: List[float],
+        namespace: Optional[str],
+        top_k: int,
+        fetch_k: int,
+        mmr_lambda: float,
+    ) -> Retrieval:
+        if namespace and namespace in self.vectorstores:
+            namespaces = [namespace]
+            per_namespace = [
+                await self._search_namespace(namespace, vector, fetch_k, with_vectors=True)
+            ]
+        else:
+            namespaces = list(self.vectorstores)
+            per_namespace = await asyncio.gather(
+                *(
+                    self._search_namespace(ns, vector, fetch_k, with_vectors=True)
+                    for ns in namespaces
+                ),
+                return_exceptions=True,
+            )
+
+        matches: List[Tuple[Document, float]] = []
+        skipped: List[str] = []
+        vectors_by_doc: Dict[int, np.ndarray] = {}
+        for ns, result in zip(namespaces, per_namespace):
+            if isinstance(result, BaseException):
+                logger.warning("Skipping namespace %s: %r", ns, result)
+                skipped.append(ns)
+                continue
+            ns_matches, ns_vectors = result
+            for (doc, _), doc_vector in zip(ns_matches, ns_vectors):
+                if len(namespaces) > 1:
+                    doc.metadata["source_namespace"] = ns
+                vectors_by_doc[id(doc)] = doc_vector
+            matches.extend(ns_matches)
+
+        # Drop duplicate chunks first so MMR spends its picks on distinct text.
+        candidates = merge_matches(matches, len(matches))
+        if not candidates:
+            return Retrieval([], skipped)
+        started = time.perf_counter()
+        picks = maximal_marginal_relevance(
+            vector, np.stack([vectors_by_doc[id(doc)] for doc in candidates]), top_k, mmr_lambda
+        )
+        _MMR_SECONDS.observe(time.perf_counter() - started)
+        return Retrieval([candidates[i] for i in picks], skipped)
+
+    async def _search_namespace(
+        self, namespace: str, vector: List[float], top_k: int, with_vectors: bool = False
+    ):
+        """Search one namespace; ``with_vectors`` also returns the matches' vectors."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        store = self.vectorstores[namespace]
+        if not with_vectors:
+            search = functools.partial(store.similarity_search_by_vector_with_score, vector, k=top_k)
+        elif isinstance(store, LocalVectorIndex):
+            search = functools.partial(store.similarity_search_with_vectors, vector, k=top_k)
+        else:
+            search = functools.partial(
+                _pinecone_search_with_vectors, self.index, namespace, vector, top_k
+            )
+        started = time.perf_counter()
+        try:
+            # The timeout also covers waiting for a free slot.
+            return await asyncio.wait_for(self._run_search(search), timeout=self.namespace_timeout)
+        except Exception:
+            _NAMESPACE_ERRORS.inc()
+            raise
+        finally:
+            _SEARCH_SECONDS.observe(time.perf_counter() - started)
+
+    async def _run_search(self, search: Callable[[], Any]):
+        # The sync client reuses its pooled HTTP connection; run it in a
+        # worker thread so the event loop keeps serving other requests.
+        await self._semaphore.acquire()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, search)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        # Release the slot when the thread is done, not when the caller gives
+        # up: a timed-out search is still occupying a worker.
+        future.add_done_callback(self._release_slot)
+        return await asyncio.shield(future)
+
+    def _release_slot(self, future: asyncio.Future):
+        self._semaphore.release()
+        if not future.cancelled():
+            # Retrieve a late failure so asyncio does not log it as unhandled;
+            # the caller already counted the timeout.
+            future.exception()
+
+
+def _pinecone_search_with_vectors(
+    index, namespace: str, vector: List[float], top_k: int
+) -> Tuple[List[Tuple[Document, float]], np.ndarray]:
+    """Query Pinecone directly so the matches come back with their values."""
+    response = index.query(
+        vector=vector,
+        top_k=top_k,
+        namespace=namespace,
+        include_values=True,
+        include_metadata=True,
+    )
+    matches = []
+    for match in response.matches:
+        metadata = dict(match.metadata or {})
+        # PineconeVectorStore keeps the chunk text under the "text" metadata key.
+        text = metadata.pop("text", "")
+        matches.append((Document(id=match.id, page_content=text, metadata=metadata), match.score))
+    vectors = np.array([match.values for match in response.matches], dtype=np.float32)
+    return matches, vectors.reshape(len(matches), -1)
+
 
+def _pinecone_centroid(index, namespace: str, ids: Sequence[str]) -> Optional[np.ndarray]:
+    vectors = []
+    for i in range(0, len(ids), 100):
+        response = index.fetch(ids=list(ids[i : i + 100]), namespace=namespace)
+        vectors.extend(record.values for record in response.vectors.values())
+    if not vectors:
+        return None
+    return np.asarray(vectors, dtype=np.float32).mean(axis=0)
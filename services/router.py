@@ -0,0 +1,141 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHITCHAT = "chitchat"
+OUT_OF_DOMAIN = "out_of_domain"
+IN_DOMAIN = "in_domain"
+
+# Seed queries per intent. Each intent's centroid is the mean of their
+# normalised embeddings; add examples here when real traffic is misrouted.
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    CHITCHAT: [
+        "hi",
+        "hello there",
+        "good morning",
+        "how are you?",
+        "thanks a lot",
+        "thank you, that helped",
+        "who are you?",
+        "what can you do?",
+        "nice to meet you",
+        "bye",
+    ],
+    OUT_OF_DOMAIN: [
+        "what's the weather like tomorrow?",
+        "give me a recipe for chocolate cake",
+        "who won the football match last night?",
+        "recommend a good movie to watch",
+        "what is the capital of Australia?",
+        "how do I lose weight fast?",
+        "write a poem about the sea",
+        "what is the price of bitcoin today?",
+        "tell me a joke",
+        "how do I file my taxes?",
+    ],
+    IN_DOMAIN: [
+        "how does the TCP three-way handshake work?",
+        "what is the difference between TCP and UDP?",
+        "explain the OSI model layers",
+        "how does OSPF compute routes?",
+        "what is subnetting and CIDR?",
+        "how does DNS resolution work?",
+        "explain binary search with code",
+        "what is the time complexity of quicksort?",
+        "how do you detect a cycle in a linked list?",
+        "explain dynamic programming with an example",
+        "how does Dijkstra's shortest path algorithm work?",
+        "what is a hash table and how are collisions handled?",
+    ],
+}
+
+
+@dataclass
+class Route:
+    intent: str
+    # Single namespace to search for in-domain queries, or None to fan out.
+    namespace: Optional[str] = None
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class QueryRouter:
+    """Classify a query embedding against precomputed centroids.
+
+    The intent is the nearest intent centroid, but chit-chat and
+    out-of-domain only win when they beat the in-domain centroid by
+    ``margin``, so borderline queries still go through retrieval. In-domain
+    queries are sent to the nearest namespace centroid when it leads the
+    runner-up by ``namespace_margin``; otherwise they fan out as before.
+    Routing is two small matrix-vector products on the embedding the
+    request already computed.
+    """
+
+    def __init__(
+        self,
+        intent_centroids: Dict[str, np.ndarray],
+        namespace_centroids: Optional[Dict[str, np.ndarray]] = None,
+        margin: float = 0.05,
+        namespace_margin: float = 0.02,
+    ):
+        self.intents = list(intent_centroids)
+        self._intent_matrix = _unit(np.stack([intent_centroids[i] for i in self.intents]))
+        self._in_domain = self.intents.index(IN_DOMAIN)
+        namespace_centroids = namespace_centroids or {}
+        self.namespaces = list(namespace_centroids)
+        self._namespace_matrix = (
+            _unit(np.stack([namespace_centroids[ns] for ns in self.namespaces]))
+            if self.namespaces
+            else None
+        )
+        self.margin = margin
+        self.namespace_margin = namespace_margin
+
+    def route(self, embedding: Sequence[float]) -> Route:
+        query = _unit(np.asarray(embedding, dtype=np.float32))
+        scores = self._intent_matrix @ query
+        best = int(np.argmax(scores))
+        if best != self._in_domain and scores[best] - scores[self._in_domain] >= self.margin:
+            return Route(self.intents[best])
+
+        if self._namespace_matrix is None or len(self.namespaces) < 2:
+            return Route(IN_DOMAIN)
+        ns_scores = self._namespace_matrix @ query
+        first, second = np.argsort(-ns_scores)[:2]
+        if ns_scores[first] - ns_scores[second] >= self.namespace_margin:
+            return Route(IN_DOMAIN, self.namespaces[int(first)])
+        return Route(IN_DOMAIN)
+
+
+async def build_router(retriever) -> QueryRouter:
+    """Embed the intent examples in one batch and load namespace centroids."""
+    texts = [text for examples in INTENT_EXAMPLES.values() for text in examples]
+    vectors = _unit(np.asarray(await retriever.aembed_queries(texts), dtype=np.float32))
+    intent_centroids: Dict[str, np.ndarray] = {}
+    start = 0
+    for intent, examples in INTENT_EXAMPLES.items():
+        intent_centroids[intent] = vectors[start : start + len(examples)].mean(axis=0)
+        start += len(examples)
+
+    namespace_centroids = await retriever.namespace_centroids(settings.ROUTER_SAMPLE_SIZE)
+    missing = set(retriever.vectorstores) - set(namespace_centroids)
+    if missing:
+        # Routing to a subset would hide the namespaces we know nothing about.
+        logger.warning("No centroid for namespaces %s; in-domain queries fan out", sorted(missing))
+        namespace_centroids = {}
+    return QueryRouter(
+        intent_centroids,
+        namespace_centroids,
+        margin=settings.ROUTER_MARGIN,
+        namespace_margin=settings.ROUTER_NAMESPACE_MARGIN,
+    )
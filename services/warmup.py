@@ -0,0 +1,117 @@
+"""Pre-fill the answer and embedding caches with frequently asked questions.
+
+Runs in the background at startup when WARMUP_QUESTIONS_PATH is set, or as a
+one-off job (useful with CACHE_BACKEND=disk, whose cache all workers share):
+
+    python -m services.warmup data/top_questions.txt --limit 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class WarmupStats:
+    questions: int = 0
+    answered: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.answered}/{self.questions} questions warmed in {self.seconds:.1f}s"
+            f" ({self.failed} failed)"
+        )
+
+
+def load_questions(
+    path: str, limit: Optional[int] = None, default_namespace: str = "default"
+) -> List[Tuple[str, str]]:
+    """Read (namespace, question) pairs, most frequent first.
+
+    Accepts a plain list (one question per line, ``#`` comments) or a JSONL
+    query log whose lines carry ``query`` or ``question`` and optionally
+    ``namespace``. Repeats in a log raise a question's rank.
+    """
+    counts: Counter = Counter()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            namespace, question = default_namespace, line
+            if line.startswith("{"):
+                record = json.loads(line)
+                question = (record.get("query") or record.get("question") or "").strip()
+                namespace = record.get("namespace") or default_namespace
+            if question:
+                counts[(namespace, question)] += 1
+    return [pair for pair, _ in counts.most_common(limit)]
+
+
+async def warm_up(
+    service, questions: List[Tuple[str, str]], max_concurrency: Optional[int] = None
+) -> WarmupStats:
+    """Answer ``questions`` through ``service`` so their results land in its caches."""
+    stats = WarmupStats(questions=len(questions))
+    started = time.perf_counter()
+
+    by_namespace: Dict[str, List[str]] = {}
+    for namespace, question in questions:
+        by_namespace.setdefault(namespace, []).append(question)
+
+    for namespace, batch in by_namespace.items():
+        results = service.query_batch(
+            batch,
+            namespace=namespace,
+            max_concurrency=max_concurrency or settings.WARMUP_CONCURRENCY,
+        )
+        async for result in results:
+            if "error" in result:
+                stats.failed += len(result["indices"])
+            else:
+                stats.answered += len(result["indices"])
+
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+async def warm_up_from_file(service, path: str, limit: Optional[int] = None) -> WarmupStats:
+    questions = load_questions(path, limit if limit is not None else settings.WARMUP_LIMIT)
+    stats = await warm_up(service, questions)
+    logger.info("Cache warm-up: %s", stats.summary())
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    from services.rag_service import RAGService
+
+    parser = argparse.ArgumentParser(description="Pre-fill the answer cache with frequent questions.")
+    parser.add_argument("path", help="Question list (one per line) or JSONL query log")
+    parser.add_argument("--limit", type=int, default=settings.WARMUP_LIMIT)
+    parser.add_argument(
+        "--namespaces",
+        nargs="+",
+        default=["computer-networking-pdf", "networking-pdf"],
+        help="Namespaces the service searches",
+    )
+    args = parser.parse_args(argv)
+
+    if settings.CACHE_BACKEND != "disk":
+        logger.warning("CACHE_BACKEND=%s: warmed answers are lost when this process exits", settings.CACHE_BACKEND)
+    service = RAGService(namespaces=args.namespaces)
+    asyncio.run(warm_up_from_file(service, args.path, args.limit))
+
+
+if __name__ == "__main__":
+    main()
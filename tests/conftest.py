@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks.fakes import FakeEmbeddings, FakeStreamingChatModel, build_corpus_index, install_fakes
+from config.settings import settings
+
+NAMESPACES = ["computer-networking-pdf", "networking-pdf"]
+
+
+@pytest.fixture
+def fake_service(monkeypatch, tmp_path):
+    """A RAGService on the offline stand-ins: local indexes, fake embeddings and LLM."""
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "local")
+    monkeypatch.setattr(settings, "LOCAL_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(settings, "LEXICAL_INDEX_DIR", str(tmp_path / "lexical"))
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "memory")
+    from services.rag_service import RAGService
+
+    service = RAGService(namespaces=NAMESPACES)
+    embeddings = FakeEmbeddings(settings.EMBEDDING_DIM)
+    llm = FakeStreamingChatModel(ttft=0.0, tokens_per_second=1e6, answer_tokens=3)
+    corpus = {ns: build_corpus_index(embeddings, ns, 30, chunk_chars=120) for ns in NAMESPACES}
+    install_fakes(service, embeddings, llm, corpus)
+    return service
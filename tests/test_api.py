@@ -1,7 +1,15 @@
+import asyncio
+import json
+import time
+
 import pytest
 from fastapi.testclient import TestClient
 
-from main import app
+import main
+from benchmarks.fakes import FakeStreamingChatModel
+from config.settings import settings
+from main import QueryRequest, _encode_ndjson, _encode_sse, _stream_events, _timed_events, app
+from utils import metrics
 
 
 @pytest.fixture(scope="module")
@@ -14,3 +22,142 @@ def test_health(client):
     assert resp.status_code == 200
     assert resp.json()["status"] == "healthy"
 
+
+def test_metrics_exposes_prometheus_text(client):
+    client.get("/health")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE rag_stage_seconds histogram" in resp.text
+    assert 'http_requests_total{status="2xx"}' in resp.text
+
+
+def test_ready_is_unavailable_until_startup_completes(client):
+    resp = client.get("/ready")
+    assert resp.status_code == 503
+    assert resp.json()["status"] == "not_ready"
+
+
+def test_mmr_options_are_validated(client):
+    resp = client.post("/query", json={"query": "What is TCP?", "use_mmr": True, "mmr_lambda": 1.5})
+    assert resp.status_code == 422
+    resp = client.post("/query", json={"query": "What is TCP?", "top_k": 5, "fetch_k": 3})
+    assert resp.status_code == 422
+
+    request = QueryRequest(query="What is TCP?", use_mmr=True, fetch_k=40)
+    assert request.mmr_options() == {"mmr_lambda": 0.5, "fetch_k": 40}
+    assert QueryRequest(query="What is TCP?", fetch_k=40).mmr_options() == {}
+
+
+class _DisconnectingRequest:
+    def __init__(self, after: float):
+        self.after = after
+
+    async def receive(self):
+        await asyncio.sleep(self.after)
+        return {"type": "http.disconnect"}
+
+
+def test_stream_stops_and_closes_source_on_disconnect():
+    closed = []
+
+    async def slow_events():
+        try:
+            for i in range(100):
+                await asyncio.sleep(0.01)
+                yield {"type": "token", "content": str(i)}
+        finally:
+            closed.append(True)
+
+    async def run():
+        return [e async for e in _stream_events(slow_events(), _DisconnectingRequest(0.035))]
+
+    abandoned = metrics.STREAMS_ABANDONED.labels()
+    before = abandoned.value
+    received = asyncio.run(run())
+    assert 0 < len(received) < 100
+    assert closed == [True]
+    assert abandoned.value == before + 1
+
+
+def test_event_encoders():
+    event = {"type": "token", "content": "TCP"}
+    assert _encode_sse(event) == 'event: token\ndata: {"type": "token", "content": "TCP"}\n\n'
+    assert _encode_sse(None) == ": ping\n\n"
+    assert _encode_ndjson(event) == '{"type": "token", "content": "TCP"}\n'
+    assert _encode_ndjson(None) == '{"type": "heartbeat"}\n'
+
+
+def test_timed_events_add_server_timings():
+    async def events():
+        yield {"type": "sources", "sources": []}
+        for token in ("a", "b", "c"):
+            await asyncio.sleep(0.01)
+            yield {"type": "token", "content": token}
+        yield {"type": "complete"}
+
+    async def run():
+        return [e async for e in _timed_events(events(), time.perf_counter())]
+
+    timed = asyncio.run(run())
+    sources, first, second, third, complete = timed
+    assert sources["retrieval_ms"] >= 0
+    assert first["ttft_ms"] >= sources["retrieval_ms"]
+    assert "ttft_ms" not in second and "ttft_ms" not in third
+    assert complete["tokens"] == 3
+    assert complete["total_ms"] >= first["ttft_ms"]
+    assert complete["tokens_per_s"] > 0
+
+
+def test_stream_events_yield_heartbeats_while_idle():
+    async def slow_events():
+        await asyncio.sleep(0.12)
+        yield {"type": "complete"}
+
+    class _ConnectedRequest:
+        async def receive(self):
+            await asyncio.sleep(10)
+
+    async def run():
+        return [e async for e in _stream_events(slow_events(), _ConnectedRequest(), heartbeat=0.03)]
+
+    received = asyncio.run(run())
+    assert received[-1] == {"type": "complete"}
+    assert received[:-1] and all(event is None for event in received[:-1])
+
+
+@pytest.fixture
+def ask_client(fake_service, monkeypatch):
+    monkeypatch.setattr(main, "rag_service", fake_service)
+    return TestClient(app)
+
+
+def test_ask_switches_to_sse_on_accept_header(ask_client):
+    resp = ask_client.post(
+        "/ask", json={"query": "What is TCP?"}, headers={"accept": "text/event-stream"}
+    )
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    frames = [frame for frame in resp.text.split("\n\n") if frame]
+    kinds = [frame.split("\n")[0] for frame in frames]
+    assert kinds[0] == "event: sources" and kinds[-1] == "event: complete"
+    first_token = json.loads(frames[1].split("\n")[1][len("data: "):])
+    assert first_token["type"] == "token" and "ttft_ms" in first_token
+
+    plain = ask_client.post("/ask", json={"query": "What is TCP?"})
+    assert plain.headers["content-type"].startswith("text/plain")
+    assert "event:" not in plain.text
+
+
+def test_ask_ndjson_carries_timings_and_heartbeats(ask_client, fake_service, monkeypatch):
+    fake_service.llm = FakeStreamingChatModel(ttft=0.2, tokens_per_second=1000, answer_tokens=3)
+    fake_service.chain = fake_service._build_chain()
+    monkeypatch.setattr(settings, "STREAM_HEARTBEAT_SECONDS", 0.05)
+
+    resp = ask_client.post("/ask", json={"query": "What is UDP?", "stream_format": "ndjson"})
+    events = [json.loads(line) for line in resp.text.splitlines()]
+    kinds = [event["type"] for event in events]
+    assert kinds[0] == "sources" and kinds[-1] == "complete"
+    assert "heartbeat" in kinds
+    assert "retrieval_ms" in events[0]
+    complete = events[-1]
+    assert complete["tokens"] == 3 and complete["tokens_per_s"] is not None
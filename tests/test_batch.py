@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+def _run_batch(service, questions, **kwargs):
+    async def run():
+        return [result async for result in service.query_batch(questions, **kwargs)]
+
+    return asyncio.run(run())
+
+
+def _count_embedding_calls(service):
+    calls = {"documents": [], "query": 0}
+    embeddings = service.retriever.embeddings
+    embed_documents, embed_query = embeddings.aembed_documents, embeddings.aembed_query
+
+    async def counting_documents(texts):
+        calls["documents"].append(list(texts))
+        return await embed_documents(texts)
+
+    async def counting_query(text):
+        calls["query"] += 1
+        return await embed_query(text)
+
+    embeddings.aembed_documents = counting_documents
+    embeddings.aembed_query = counting_query
+    return calls
+
+
+def test_batch_dedupes_questions_and_maps_indices(fake_service):
+    results = _run_batch(fake_service, ["What is TCP?", "What is UDP?", " What is TCP? "])
+    by_question = {result["question"]: result for result in results}
+    assert set(by_question) == {"What is TCP?", "What is UDP?"}
+    assert by_question["What is TCP?"]["indices"] == [0, 2]
+    assert by_question["What is UDP?"]["indices"] == [1]
+    assert all(result["answer"] for result in results)
+
+
+def test_uncached_questions_are_embedded_in_one_call(fake_service):
+    fake_service.cache.set("default:What is TCP?", {"answer": "cached", "sources": []})
+    calls = _count_embedding_calls(fake_service)
+
+    results = _run_batch(fake_service, ["What is TCP?", "What is UDP?", "What is ARP?", "hello"])
+    assert calls == {"documents": [["What is UDP?", "What is ARP?"]], "query": 0}
+    answers = {result["question"]: result["answer"] for result in results}
+    assert answers["What is TCP?"] == "cached"
+    assert answers["hello"].startswith("Hello!")
+
+
+def test_failing_question_yields_an_error_without_aborting(fake_service):
+    retrieve = fake_service.retriever.aretrieve
+
+    async def flaky(query, **kwargs):
+        if query == "What is BGP?":
+            raise RuntimeError("namespace unavailable")
+        return await retrieve(query, **kwargs)
+
+    fake_service.retriever.aretrieve = flaky
+    results = _run_batch(fake_service, ["What is TCP?", "What is BGP?", "What is UDP?"])
+    errors = [result for result in results if "error" in result]
+    assert [(e["question"], e["indices"], e["error"]) for e in errors] == [
+        ("What is BGP?", [1], "namespace unavailable")
+    ]
+    assert sum("answer" in result for result in results) == 2
+
+
+def _track_queries(service, delay=0.02):
+    state = {"active": 0, "max_active": 0, "started": 0, "cancelled": 0}
+
+    async def query(question, **kwargs):
+        state["started"] += 1
+        state["active"] += 1
+        state["max_active"] = max(state["max_active"], state["active"])
+        try:
+            await asyncio.sleep(delay)
+            return {"answer": question, "sources": [], "namespace": kwargs.get("namespace")}
+        except asyncio.CancelledError:
+            state["cancelled"] += 1
+            raise
+        finally:
+            state["active"] -= 1
+
+    service.query = query
+    return state
+
+
+def test_batch_respects_max_concurrency(fake_service):
+    state = _track_queries(fake_service)
+    results = _run_batch(fake_service, [f"question {i}" for i in range(7)], max_concurrency=2)
+    assert len(results) == 7
+    assert state["max_active"] == 2
+
+
+def test_closing_the_batch_cancels_pending_questions(fake_service):
+    state = _track_queries(fake_service, delay=0.05)
+
+    async def run():
+        results = fake_service.query_batch([f"question {i}" for i in range(6)], max_concurrency=2)
+        first = await results.__anext__()
+        await results.aclose()  # what the endpoint does when the client disconnects
+        return first
+
+    first = asyncio.run(run())
+    assert first["answer"].startswith("question")
+    assert state["active"] == 0
+    assert state["started"] < 6
+    assert state["cancelled"] >= 1
+
+
+def test_batch_endpoint_streams_ndjson(fake_service, monkeypatch):
+    monkeypatch.setattr(main, "rag_service", fake_service)
+    client = TestClient(main.app)
+    resp = client.post(
+        "/query/batch", json={"questions": ["What is TCP?", "What is UDP?", "What is TCP?"]}
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(line["indices"] for line in lines) == [[0, 2], [1]]
+    assert all("sources" not in line for line in lines)
+
+    resp = client.post("/query/batch", json={"questions": []})
+    assert resp.status_code == 422
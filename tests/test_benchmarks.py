@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_load_test(tmp_path, endpoint):
+    output = tmp_path / f"{endpoint}.json"
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("OPENAI_", "PINECONE_"))}
+    env["LOCAL_INDEX_DIR"] = str(tmp_path / "index")
+    env["CACHE_DIR"] = str(tmp_path / "cache")
+    subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.load_test",
+            "--endpoint", endpoint,
+            "--requests", "12",
+            "--concurrency", "4",
+            "--distinct-questions", "6",
+            "--corpus-size", "40",
+            "--embed-latency", "0",
+            "--ttft", "0.01",
+            "--tokens-per-second", "2000",
+            "--answer-tokens", "8",
+            "--output", str(output),
+        ],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    with open(output) as f:
+        return json.load(f)["results"]
+
+
+def test_load_test_drives_query_offline(tmp_path):
+    results = _run_load_test(tmp_path, "query")
+    assert results["requests"] == 12 and results["errors"] == 0
+    assert results["latency_ms"]["p95"] >= results["latency_ms"]["p50"]
+
+
+def test_load_test_reports_ttft_for_ask(tmp_path):
+    results = _run_load_test(tmp_path, "ask")
+    assert results["errors"] == 0
+    assert results["ttft_ms"]["p50"] > 0
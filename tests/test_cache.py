@@ -0,0 +1,34 @@
+from utils.cache import LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_lru_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("utils.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(max_size=10, ttl_seconds=5)
+    cache.set("a", 1)
+    now[0] += 6
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_lru_cache_respects_byte_budget():
+    cache = LRUCache(max_size=100, max_bytes=100, sizeof=lambda value: len(value))
+    cache.set("a", "x" * 60)
+    cache.set("b", "y" * 60)
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 60
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 60
+    assert (stats["hits"], stats["misses"]) == (1, 1)
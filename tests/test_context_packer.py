@@ -0,0 +1,47 @@
+from langchain_core.documents import Document
+
+from services.context_packer import ContextPacker, format_doc
+
+
+def _doc(text, score):
+    return Document(page_content=text, metadata={"score": score, "source_namespace": "ns"})
+
+
+def test_packs_best_chunks_within_budget():
+    packer = ContextPacker(max_tokens=10_000, model="gpt-3.5-turbo")
+    docs = [_doc("low " * 10, 0.1), _doc("high " * 10, 0.9)]
+    packed = packer.pack(docs)
+    assert [d.metadata["score"] for d in packed.docs] == [0.9, 0.1]
+    assert packed.dropped == 0 and not packed.truncated
+    expected = sum(packer.count(format_doc(d)) for d in packed.docs) + packer.separator_tokens
+    assert packed.tokens == expected
+
+
+def test_truncates_then_drops_the_tail():
+    packer = ContextPacker(max_tokens=300, model="gpt-3.5-turbo", min_chunk_tokens=20)
+    docs = [_doc("alpha " * 20, 0.9), _doc("beta " * 400, 0.8), _doc("gamma " * 400, 0.7)]
+    packed = packer.pack(docs)
+    assert packed.tokens <= 300
+    assert len(packed.docs) == 2
+    assert packed.docs[0] is docs[0]
+    assert packed.docs[1].metadata["truncated"] is True
+    assert packed.docs[1].page_content.startswith("beta")
+    assert packed.truncated and packed.dropped == 1
+
+
+def test_drops_chunk_when_too_little_room_remains():
+    packer = ContextPacker(max_tokens=5, model="gpt-3.5-turbo", min_chunk_tokens=64)
+    packed = packer.pack([_doc("word " * 100, 0.5)])
+    assert packed.docs == [] and packed.tokens == 0 and packed.dropped == 1
+
+
+def test_preserve_order_keeps_mmr_picks_under_a_tight_budget():
+    # MMR pick order: the diverse second pick scores below the third, a
+    # near-duplicate of the first. The budget fits the first two picks only.
+    picks = [_doc("tcp " * 20, 0.9), _doc("udp " * 20, 0.5), _doc("tcp again " * 20, 0.85)]
+    probe = ContextPacker(max_tokens=10_000, model="gpt-3.5-turbo")
+    budget = sum(probe.count(format_doc(d)) for d in picks[:2]) + probe.separator_tokens
+    packer = ContextPacker(max_tokens=budget, model="gpt-3.5-turbo", min_chunk_tokens=64)
+
+    assert packer.pack(picks, preserve_order=True).docs == picks[:2]
+    assert picks[1] not in packer.pack(picks).docs
@@ -0,0 +1,81 @@
+import sqlite3
+
+import zstandard
+
+from utils.disk_cache import DiskCache
+
+
+def test_disk_cache_round_trip_survives_reopen(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    cache = DiskCache(path, ttl_seconds=60)
+    cache.set("ns:q", {"answer": "tcp " * 100, "sources": []})
+
+    reopened = DiskCache(path, ttl_seconds=60)
+    assert reopened.get("ns:q") == {"answer": "tcp " * 100, "sources": []}
+    assert reopened.get("missing") is None
+    assert (reopened.stats()["hits"], reopened.stats()["misses"]) == (1, 1)
+
+
+def test_disk_cache_expires_entries(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("utils.disk_cache.time.time", lambda: now[0])
+    cache = DiskCache(str(tmp_path / "c.sqlite3"), ttl_seconds=5, prune_interval=2)
+    cache.set("a", 1)
+    now[0] += 6
+    assert cache.get("a") is None
+    assert len(cache) == 1  # reads never write; the next prune removes it
+    cache.set("b", 2)
+    assert len(cache) == 1
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disk_cache_trims_to_max_size(tmp_path):
+    cache = DiskCache(str(tmp_path / "c.sqlite3"), max_size=3, prune_interval=1)
+    for i in range(5):
+        cache.set(f"k{i}", i)
+    assert len(cache) == 3
+    assert cache.get("k0") is None
+    assert cache.get("k4") == 4
+
+
+def test_disk_cache_errors_are_misses_and_skipped_writes(tmp_path):
+    path = str(tmp_path / "c.sqlite3")
+    cache = DiskCache(path)
+    cache.set("a", 1)
+
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # another worker holding the write lock
+    try:
+        cache.set("b", 2)  # gives up after the short busy timeout
+        assert cache.get("a") == 1  # WAL readers are not blocked
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert cache.get("b") is None
+
+    class BrokenConnection:
+        def execute(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+    cache._conn = BrokenConnection()
+    assert cache.get("a") is None
+    cache.set("a", 3)
+    cache.delete("a")
+    cache.clear()
+
+
+def test_disk_cache_corrupt_entries_are_misses(tmp_path):
+    path = str(tmp_path / "c.sqlite3")
+    cache = DiskCache(path)
+    cache.set("truncated", {"answer": "x" * 100})
+    cache.set("not-json", 1)
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE entries SET value = substr(value, 1, 8) WHERE key = 'truncated'")
+        conn.execute(
+            "UPDATE entries SET value = ? WHERE key = 'not-json'",
+            (zstandard.ZstdCompressor().compress(b"{not json"),),
+        )
+
+    assert cache.get("truncated") is None
+    assert cache.get("not-json") is None
+    assert (cache.hits, cache.misses) == (0, 2)
@@ -0,0 +1,184 @@
+import asyncio
+
+import numpy as np
+
+from services.ingestion import (
+    IngestManifest,
+    IngestionPipeline,
+    LexicalIndexSink,
+    LocalIndexSink,
+    discover_pdfs,
+    embed_with_retry,
+)
+from services.lexical_index import LexicalIndex
+from services.local_index import LocalVectorIndex
+
+
+def write_pdf(path, page_texts):
+    """Write a minimal text-only PDF, one line of text per page."""
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for i, text in enumerate(page_texts):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_id} 0 R")
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {content_id} 0 R "
+            "/Resources << /Font << /F1 3 0 R >> >> >>"
+        ).encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    body = b"%PDF-1.4\n"
+    offsets = []
+    for key in sorted(objects):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (key, objects[key])
+    xref_start = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    body += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_start}\n%%EOF\n".encode()
+    path.write_bytes(body)
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.batches = 0
+
+    async def aembed_documents(self, texts):
+        self.batches += 1
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+
+def test_pipeline_ingests_pdfs_into_local_index(tmp_path):
+    docs = tmp_path / "pdfs"
+    docs.mkdir()
+    for n in range(2):
+        write_pdf(docs / f"doc{n}.pdf", [f"Doc {n} page {p} covers OSPF" for p in range(5)])
+
+    embeddings = FakeEmbeddings()
+    sink = LocalIndexSink(str(tmp_path / "index" / "ns"), dim=3)
+    pipeline = IngestionPipeline(
+        embeddings, sink, workers=2, pages_per_task=2, embed_batch_size=4
+    )
+    stats = asyncio.run(pipeline.run(discover_pdfs([str(docs)])))
+
+    assert (stats.files, stats.pages, stats.chunks) == (2, 10, 10)
+    assert embeddings.batches == 3
+    index = LocalVectorIndex.load(str(tmp_path / "index" / "ns"), dim=3)
+    assert len(index) == 10
+    assert {m["source"] for m in index.metadatas} == {"doc0.pdf", "doc1.pdf"}
+
+
+def test_embed_with_retry_recovers_from_transient_errors():
+    class Flaky:
+        calls = 0
+
+        async def aembed_documents(self, texts):
+            self.calls += 1
+            if self.calls < 3:
+                raise RuntimeError("rate limited")
+            return [[1.0] for _ in texts]
+
+    flaky = Flaky()
+    vectors = asyncio.run(embed_with_retry(flaky, ["a", "b"], base_delay=0.001))
+    assert vectors == [[1.0], [1.0]]
+    assert flaky.calls == 3
+
+
+def test_reingestion_only_embeds_changed_chunks(tmp_path):
+    docs = tmp_path / "pdfs"
+    docs.mkdir()
+    write_pdf(docs / "a.pdf", ["TCP page one", "TCP page two"])
+    write_pdf(docs / "b.pdf", ["UDP page one"])
+    manifest_path = str(tmp_path / "manifest.json")
+    index_path = str(tmp_path / "index" / "ns")
+    lexical_path = str(tmp_path / "lexical" / "ns")
+
+    def run():
+        embeddings = FakeEmbeddings()
+        pipeline = IngestionPipeline(
+            embeddings,
+            LexicalIndexSink(LocalIndexSink(index_path, dim=3), lexical_path),
+            manifest=IngestManifest(manifest_path),
+            workers=1,
+        )
+        return asyncio.run(pipeline.run(discover_pdfs([str(docs)]))), embeddings
+
+    stats, _ = run()
+    assert stats.chunks == 3
+
+    stats, embeddings = run()
+    assert (stats.skipped_files, stats.chunks, embeddings.batches) == (2, 0, 0)
+
+    write_pdf(docs / "a.pdf", ["TCP page one", "TCP page two, revised"])
+    (docs / "b.pdf").unlink()
+    stats, _ = run()
+    assert (stats.chunks, stats.skipped_chunks, stats.deleted_chunks) == (1, 1, 2)
+
+    index = LocalVectorIndex.load(index_path, dim=3)
+    assert sorted(index.texts) == ["TCP page one", "TCP page two, revised"]
+    lexical = LexicalIndex.load(lexical_path)
+    assert sorted(lexical.texts) == sorted(index.texts)
+    assert lexical.search_with_score("UDP", k=1) == []
+    assert lexical.search_with_score("revised", k=1)[0][0].page_content == "TCP page two, revised"
+
+
+def test_ingesting_one_extra_file_keeps_the_rest(tmp_path):
+    docs = tmp_path / "pdfs"
+    docs.mkdir()
+    write_pdf(docs / "a.pdf", ["TCP page one"])
+    write_pdf(docs / "b.pdf", ["UDP page one"])
+    extra = tmp_path / "c.pdf"
+    write_pdf(extra, ["ICMP page one"])
+    manifest_path = str(tmp_path / "manifest.json")
+    index_path = str(tmp_path / "index" / "ns")
+
+    def run(paths, prune=False):
+        pipeline = IngestionPipeline(
+            FakeEmbeddings(),
+            LocalIndexSink(index_path, dim=3),
+            manifest=IngestManifest(manifest_path),
+            prune=prune,
+            workers=1,
+        )
+        return asyncio.run(pipeline.run(discover_pdfs(paths)))
+
+    run([str(docs)])
+    stats = run([str(extra)])
+    assert (stats.chunks, stats.deleted_chunks) == (1, 0)
+    index = LocalVectorIndex.load(index_path, dim=3)
+    assert sorted(index.texts) == ["ICMP page one", "TCP page one", "UDP page one"]
+
+    stats = run([str(extra)], prune=True)
+    assert stats.deleted_chunks == 2
+    assert LocalVectorIndex.load(index_path, dim=3).texts == ["ICMP page one"]
+
+
+def test_local_sink_adds_buffered_batches_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "index" / "ns")
+    sink = LocalIndexSink(path, dim=3)
+    calls = []
+    add = sink.index.add
+    monkeypatch.setattr(sink.index, "add", lambda *args: calls.append(len(args[0])) or add(*args))
+
+    def chunk(doc_id, text):
+        return {"id": doc_id, "text": text, "metadata": {"source": "a.pdf"}}
+
+    async def ingest():
+        for batch in range(5):
+            await sink.upsert([chunk(f"c{batch}", "old")], [[1.0, float(batch), 0.0]])
+        await sink.delete(["c1"])
+        await sink.upsert([chunk("c2", "new")], [[0.0, 0.0, 1.0]])
+
+    asyncio.run(ingest())
+    sink.close()
+
+    assert calls == [4]
+    index = LocalVectorIndex.load(path, dim=3)
+    assert index.ids == ["c0", "c2", "c3", "c4"]
+    assert index.texts[1] == "new"
+    assert np.allclose(index.vectors[1], [0.0, 0.0, 1.0])
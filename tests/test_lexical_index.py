@@ -0,0 +1,97 @@
+import numpy as np
+
+from services.lexical_index import LexicalIndex, open_lexical_index, tokenize
+
+
+def _build():
+    texts = [
+        "OSPF is a link-state routing protocol that floods link-state advertisements.",
+        "RIP is a distance-vector routing protocol with a hop count limit.",
+        "TCP is specified in RFC 793 and provides reliable byte streams.",
+        "UDP is a connectionless transport protocol.",
+        "BGP exchanges routes between autonomous systems.",
+    ]
+    index = LexicalIndex()
+    index.add([f"doc-{i}" for i in range(len(texts))], texts, [{"page": i} for i in range(len(texts))])
+    return index
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("What is RFC-793?") == ["rfc", "793"]
+
+
+def test_exact_terms_rank_first():
+    index = _build()
+    assert index.search_with_score("OSPF", k=3)[0][0].id == "doc-0"
+    matches = index.search_with_score("rfc 793", k=3)
+    assert matches[0][0].id == "doc-2"
+    assert matches[0][0].metadata == {"page": 2}
+    assert index.search_with_score("multicast", k=3) == []
+
+
+def test_scores_are_sorted_and_limited_to_k():
+    index = _build()
+    matches = index.search_with_score("routing protocol", k=2)
+    assert len(matches) == 2
+    assert {doc.id for doc, _ in matches} == {"doc-0", "doc-1"}
+    assert matches[0][1] >= matches[1][1]
+
+
+def test_delete_and_replace():
+    index = _build()
+    index.delete(["doc-0"])
+    assert index.search_with_score("OSPF", k=3) == []
+    index.add(["doc-3"], ["UDP carries OSPF-free datagrams."], [{}])
+    assert len(index) == 4
+    assert index.search_with_score("datagrams", k=1)[0][0].id == "doc-3"
+
+
+def test_save_and_memory_mapped_load(tmp_path):
+    _build().save(str(tmp_path / "ns"))
+    loaded = LexicalIndex.load(str(tmp_path / "ns"))
+    assert isinstance(loaded.impacts, np.memmap)
+    assert loaded.search_with_score("OSPF", k=1)[0][0].id == "doc-0"
+    assert open_lexical_index(str(tmp_path), "missing") is None
+
+
+def test_postings_match_a_brute_force_bm25():
+    rng = np.random.default_rng(0)
+    vocabulary = [f"term{i}" for i in range(50)]
+    texts = [" ".join(rng.choice(vocabulary, size=rng.integers(5, 30))) for _ in range(200)]
+    index = LexicalIndex()
+    index.add([str(i) for i in range(len(texts))], texts, [{}] * len(texts))
+    rows, scores = index.search("term1 term7 term42", k=10)
+
+    # CSR invariants: one slice per term, unique doc ids within a slice.
+    assert index.offsets[0] == 0 and index.offsets[-1] == len(index.doc_ids)
+    assert np.all(np.diff(index.offsets) > 0)
+    for t in range(len(index.terms)):
+        posting = index.doc_ids[index.offsets[t] : index.offsets[t + 1]]
+        assert len(np.unique(posting)) == len(posting)
+
+    tokens = [tokenize(text) for text in texts]
+    avg_length = np.mean([len(doc) for doc in tokens])
+    expected = np.zeros(len(texts))
+    for term in ("term1", "term7", "term42"):
+        df = sum(term in doc for doc in tokens)
+        idf = np.log1p((len(texts) - df + 0.5) / (df + 0.5))
+        for i, doc in enumerate(tokens):
+            tf = doc.count(term)
+            norm = index.k1 * (1 - index.b + index.b * len(doc) / avg_length)
+            expected[i] += idf * tf * (index.k1 + 1) / (tf + norm)
+    top = np.argsort(-expected, kind="stable")[:10]
+    assert np.allclose(scores, expected[top], rtol=1e-5)
+    assert set(rows) == set(top)
+
+
+def test_search_reuses_the_postings_until_the_corpus_changes(monkeypatch):
+    index = _build()
+    builds = []
+    build = index._build
+    monkeypatch.setattr(index, "_build", lambda: builds.append(1) or build())
+    for _ in range(3):
+        index.search("routing", k=2)
+    assert len(builds) == 1
+    index.add(["doc-5"], ["EIGRP is a routing protocol."], [{}])
+    index.search("routing", k=2)
+    assert len(builds) == 2
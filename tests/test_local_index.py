@@ -0,0 +1,72 @@
+import numpy as np
+
+from services.local_index import LocalVectorIndex
+
+
+def _build(dim=8, n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    index = LocalVectorIndex(dim)
+    index.add(
+        [f"doc-{i}" for i in range(n)],
+        vectors,
+        [f"text {i}" for i in range(n)],
+        [{"page": i} for i in range(n)],
+    )
+    return index, vectors
+
+
+def test_search_returns_nearest_first():
+    index, vectors = _build()
+    matches = index.similarity_search_by_vector_with_score(vectors[7], k=3)
+    assert matches[0][0].id == "doc-7"
+    assert matches[0][0].page_content == "text 7"
+    assert matches[0][1] > 0.999
+    assert [score for _, score in matches] == sorted((s for _, s in matches), reverse=True)
+
+
+def test_save_and_memory_mapped_load(tmp_path):
+    index, vectors = _build()
+    index.save(str(tmp_path / "ns"))
+    loaded = LocalVectorIndex.load(str(tmp_path / "ns"), dim=8)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.similarity_search_by_vector_with_score(vectors[3], k=1)[0][0].id == "doc-3"
+
+
+def test_int8_index_keeps_ranking(tmp_path):
+    index, vectors = _build()
+    index.save(str(tmp_path / "ns"), dtype="int8")
+    loaded = LocalVectorIndex.load(str(tmp_path / "ns"), dim=8)
+    assert loaded.vectors.dtype == np.int8
+    doc, score = loaded.similarity_search_by_vector_with_score(vectors[11], k=1)[0]
+    assert doc.id == "doc-11"
+    assert abs(score - 1.0) < 0.02
+
+
+def test_add_replaces_and_delete_removes():
+    index, vectors = _build(n=5)
+    index.add(["doc-0"], [vectors[4]], ["replaced"], [{}])
+    assert len(index) == 5
+    assert index.texts[0] == "replaced"
+    index.delete(["doc-1", "missing"])
+    assert len(index) == 4
+    assert "doc-1" not in index.ids
+
+
+def test_missing_namespace_loads_empty(tmp_path):
+    index = LocalVectorIndex.load(str(tmp_path / "nope"), dim=4)
+    assert index.similarity_search_by_vector_with_score([1, 0, 0, 0], k=3) == []
+
+
+def test_search_with_vectors_returns_each_matches_row(tmp_path):
+    index, vectors = _build()
+    index.save(str(tmp_path / "ns"), dtype="int8")
+    quantized = LocalVectorIndex.load(str(tmp_path / "ns"), dim=8)
+    query = vectors[5] / np.linalg.norm(vectors[5])
+    for store, tolerance in ((index, 1e-6), (quantized, 0.02)):
+        matches, found = store.similarity_search_with_vectors(vectors[5], k=4)
+        assert found.dtype == np.float32 and found.shape == (4, 8)
+        for (doc, score), vector in zip(matches, found):
+            original = vectors[int(doc.id.split("-")[1])]
+            assert np.allclose(vector, original / np.linalg.norm(original), atol=tolerance)
+            assert abs(float(vector @ query) - score) < tolerance
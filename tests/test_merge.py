@@ -0,0 +1,33 @@
+from langchain_core.documents import Document
+
+from services.merge import merge_matches, reciprocal_rank_fusion
+
+
+def test_merge_keeps_global_top_k_by_score():
+    matches = [
+        (Document(page_content="tcp handshake"), 0.71),
+        (Document(page_content="udp header"), 0.92),
+        (Document(page_content="ip routing"), 0.85),
+    ]
+    merged = merge_matches(matches, top_k=2)
+    assert [doc.page_content for doc in merged] == ["udp header", "ip routing"]
+    assert merged[0].metadata["score"] == 0.92
+
+
+def test_merge_drops_duplicate_chunks():
+    matches = [
+        (Document(page_content="TCP  uses a three-way handshake."), 0.9),
+        (Document(page_content="tcp uses a three-way handshake."), 0.8),
+        (Document(page_content="UDP is connectionless."), 0.7),
+    ]
+    merged = merge_matches(matches, top_k=3)
+    assert [doc.metadata["score"] for doc in merged] == [0.9, 0.7]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    a, b, c = (Document(page_content=t, id=t) for t in ("ospf", "rip", "bgp"))
+    dense = [(a, 0.9), (b, 0.8)]
+    sparse = [(c, 12.0), (b, 7.5)]
+    fused = reciprocal_rank_fusion([dense, sparse], k=60)
+    assert [doc.id for doc, _ in fused] == ["rip", "ospf", "bgp"]
+    assert fused[0][1] == 1 / 62 + 1 / 62
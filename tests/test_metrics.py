@@ -0,0 +1,47 @@
+import json
+import os
+
+from utils import metrics
+
+
+def test_histogram_buckets_are_cumulative_in_exposition():
+    registry = {}
+    hist = metrics.histogram(
+        "test_latency_seconds", "Test latency.", ["stage"], buckets=(0.1, 1.0), registry=registry
+    )
+    series = hist.labels("a")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        series.observe(value)
+    assert series.counts == [2, 1, 1]
+
+    text = metrics.render(registry=registry)
+    assert "test_latency_seconds" not in metrics.render()
+    assert 'test_latency_seconds_bucket{stage="a",le="0.1"} 2' in text
+    assert 'test_latency_seconds_bucket{stage="a",le="1"} 3' in text
+    assert 'test_latency_seconds_bucket{stage="a",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_count{stage="a"} 4' in text
+    assert 'test_latency_seconds_sum{stage="a"} 3.65' in text
+
+
+def test_collect_sums_workers_and_drops_dead_gauges(tmp_path):
+    registry = {}
+    requests = metrics.counter("test_requests_total", "Test requests.", registry=registry).labels()
+    in_flight = metrics.gauge("test_in_flight", "Test gauge.", registry=registry).labels()
+    requests.inc(2)
+    in_flight.set(1)
+
+    # A worker that has exited: its counter still counts, its gauge does not.
+    dead_pid = 2 ** 22 + 12345
+    with open(os.path.join(tmp_path, f"{dead_pid}.json"), "w") as f:
+        json.dump(
+            {
+                "pid": dead_pid,
+                "metrics": {"test_requests_total": [[[], 5.0]], "test_in_flight": [[[], 3.0]]},
+            },
+            f,
+        )
+
+    totals = metrics.collect(str(tmp_path), registry)
+    assert totals["test_requests_total"][()] == 7.0
+    assert totals["test_in_flight"][()] == 1.0
+    assert os.path.exists(os.path.join(tmp_path, f"{os.getpid()}.json"))
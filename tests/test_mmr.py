@@ -0,0 +1,26 @@
+import numpy as np
+
+from services.mmr import maximal_marginal_relevance
+
+
+def test_lambda_one_ranks_by_relevance():
+    query = [1.0, 0.0]
+    candidates = [[0.6, 0.8], [1.0, 0.0], [0.8, 0.6]]
+    assert list(maximal_marginal_relevance(query, candidates, k=3, lambda_mult=1.0)) == [1, 2, 0]
+
+
+def test_near_duplicates_are_skipped():
+    query = [1.0, 0.0, 0.0]
+    candidates = [
+        [0.95, 0.31, 0.0],
+        [0.95, 0.30, 0.01],  # overlapping chunk of the first one
+        [0.80, 0.0, 0.60],
+    ]
+    picks = set(maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.5))
+    assert 2 in picks and len(picks & {0, 1}) == 1
+
+
+def test_k_larger_than_candidates_and_empty_input():
+    assert sorted(maximal_marginal_relevance([1.0, 0.0], [[1.0, 0.0], [0.0, 1.0]], k=5)) == [0, 1]
+    assert len(maximal_marginal_relevance([1.0, 0.0], np.empty((0, 2)), k=5)) == 0
+
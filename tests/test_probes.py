@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+from services.probes import DependencyProbes
+
+
+def test_run_once_records_status_latency_and_errors():
+    async def ok():
+        return {"namespaces": {}}
+
+    async def broken():
+        raise ConnectionError("refused")
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    probes = DependencyProbes({"ok": ok, "broken": broken, "slow": slow}, timeout=0.05)
+    assert not probes.ready()
+    asyncio.run(probes.run_once())
+
+    snapshot = probes.snapshot()
+    assert snapshot["ok"]["ok"] and snapshot["ok"]["error"] is None
+    assert snapshot["ok"]["latency_ms"] is not None
+    assert snapshot["broken"]["error"] == "ConnectionError: refused"
+    assert "timed out" in snapshot["slow"]["error"]
+    assert not probes.ready()
+
+
+def test_stale_results_are_not_ready():
+    async def ok():
+        return None
+
+    probes = DependencyProbes({"ok": ok}, interval=10)
+    asyncio.run(probes.run_once())
+    assert probes.ready()
+    probes.results["ok"].checked_at = time.time() - 31
+    assert not probes.ready()
+
+
+def test_background_loop_refreshes_until_stopped():
+    calls = []
+
+    async def probe():
+        calls.append(1)
+
+    async def run():
+        probes = DependencyProbes({"p": probe}, interval=0.01)
+        probes.start()
+        await asyncio.sleep(0.05)
+        await probes.stop()
+        return len(calls)
+
+    seen = asyncio.run(run())
+    assert seen >= 2
+    assert len(calls) == seen
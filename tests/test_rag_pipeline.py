@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+from langchain_core.documents import Document
+
+from services.retriever import Retrieval
+
+
+def _record_retrievals(service):
+    calls = []
+    retrieve = service.retriever.aretrieve
+
+    async def recording(query, **kwargs):
+        calls.append(kwargs.get("mmr_lambda"))
+        return await retrieve(query, **kwargs)
+
+    service.retriever.aretrieve = recording
+    return calls
+
+
+def test_mmr_and_plain_answers_are_cached_separately(fake_service):
+    calls = _record_retrievals(fake_service)
+
+    async def run():
+        await fake_service.query("How does TCP work?", top_k=3)
+        await fake_service.query("How does TCP work?", top_k=3, mmr_lambda=0.2, fetch_k=10)
+        # Both are cached now, each under its own key.
+        await fake_service.query("How does TCP work?", top_k=3)
+        await fake_service.query("How does TCP work?", top_k=3, mmr_lambda=0.2, fetch_k=10)
+        # Different MMR settings are a different answer too.
+        await fake_service.query("How does TCP work?", top_k=3, mmr_lambda=0.7, fetch_k=10)
+
+    asyncio.run(run())
+    assert calls == [None, 0.2, 0.7]
+
+
+def test_in_flight_generations_are_not_shared_across_mmr_settings(fake_service):
+    calls = _record_retrievals(fake_service)
+
+    async def run():
+        await asyncio.gather(
+            fake_service.query("What is UDP?"),
+            fake_service.query("What is UDP?", mmr_lambda=0.5),
+            fake_service.query("What is UDP?"),
+        )
+
+    asyncio.run(run())
+    assert sorted(calls, key=str) == [0.5, None]
+
+
+class _HungStore:
+    def __init__(self, release):
+        self.release = release
+
+    def similarity_search_by_vector_with_score(self, vector, k=4):
+        self.release.wait(5)
+        return []
+
+
+def test_answers_from_partial_retrievals_are_not_cached(fake_service):
+    release = threading.Event()
+    fake_service.retriever.vectorstores["networking-pdf"] = _HungStore(release)
+    fake_service.retriever.namespace_timeout = 0.05
+
+    async def run():
+        return [event async for event in fake_service.query_stream("What is ARP?")]
+
+    try:
+        events = asyncio.run(run())
+    finally:
+        release.set()
+    assert events[0]["skipped_namespaces"] == ["networking-pdf"]
+    assert "".join(e["content"] for e in events if e["type"] == "token")
+    assert fake_service.cache.get("default:What is ARP?") is None
+    assert fake_service.semantic_cache.get("default", fake_service.embeddings.embed_query("What is ARP?")) is None
+
+
+def test_mmr_results_are_packed_in_pick_order(fake_service):
+    # MMR picked the diverse chunk second although it scores lowest.
+    picks = [
+        Document(id=doc_id, page_content=f"chunk {doc_id}", metadata={"score": score})
+        for doc_id, score in (("first", 0.9), ("diverse", 0.4), ("second", 0.8))
+    ]
+
+    async def retrieve(query, **kwargs):
+        return Retrieval(
+            [Document(id=d.id, page_content=d.page_content, metadata=dict(d.metadata)) for d in picks]
+        )
+
+    fake_service.retriever.aretrieve = retrieve
+
+    async def run():
+        mmr = await fake_service.query("What is BGP?", mmr_lambda=0.5)
+        plain = await fake_service.query("What is BGP?")
+        return mmr, plain
+
+    mmr, plain = asyncio.run(run())
+    assert [s["id"] for s in mmr["sources"]] == ["first", "diverse", "second"]
+    assert [s["id"] for s in plain["sources"]] == ["first", "second", "diverse"]
@@ -0,0 +1,83 @@
+import asyncio
+import sqlite3
+
+from middleware.rate_limit import RateLimitMiddleware
+
+
+async def _ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _request(middleware, ip="1.2.3.4", headers=()):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "client": (ip, 1234), "headers": list(headers)}
+    asyncio.run(middleware(scope, receive, send))
+    return messages[0]["status"]
+
+
+def test_rejects_after_bucket_is_empty():
+    middleware = RateLimitMiddleware(_ok_app, max_requests=2, window=60)
+    assert [_request(middleware) for _ in range(3)] == [200, 200, 429]
+    assert _request(middleware, ip="5.6.7.8") == 200
+
+
+def test_bucket_refills_over_time():
+    middleware = RateLimitMiddleware(_ok_app, max_requests=2, window=10)
+    assert middleware.allow("c", now=0.0)
+    assert middleware.allow("c", now=0.0)
+    assert not middleware.allow("c", now=1.0)
+    assert middleware.allow("c", now=5.0)
+
+
+def test_client_state_is_bounded():
+    middleware = RateLimitMiddleware(_ok_app, max_requests=5, window=60, max_clients=100)
+    for i in range(1000):
+        middleware.allow(f"10.0.{i // 256}.{i % 256}", now=float(i) / 1000)
+    assert len(middleware.buckets) == 100
+
+
+def test_uses_forwarded_for_behind_trusted_proxy():
+    middleware = RateLimitMiddleware(_ok_app, max_requests=1, window=60, trusted_proxies=1)
+    headers = [(b"x-forwarded-for", b"9.9.9.9, 203.0.113.7")]
+    assert _request(middleware, ip="172.18.0.2", headers=headers) == 200
+    assert _request(middleware, ip="172.18.0.2", headers=headers) == 429
+    other = [(b"x-forwarded-for", b"203.0.113.8")]
+    assert _request(middleware, ip="172.18.0.2", headers=other) == 200
+
+
+def test_shared_buckets_enforce_one_limit_across_workers(tmp_path):
+    path = str(tmp_path / "rate_limit.sqlite3")
+    worker_a = RateLimitMiddleware(_ok_app, max_requests=3, window=60, shared_state_path=path)
+    worker_b = RateLimitMiddleware(_ok_app, max_requests=3, window=60, shared_state_path=path)
+
+    results = [
+        worker.allow("c", now=100.0) for worker in (worker_a, worker_b, worker_a, worker_b)
+    ]
+    assert results == [True, True, True, False]
+    # 3 tokens per 60s refill one token every 20s.
+    assert worker_b.allow("c", now=121.0)
+    assert not worker_a.allow("c", now=121.0)
+
+
+def test_shared_buckets_fail_open_while_the_file_is_locked(tmp_path):
+    path = str(tmp_path / "rate_limit.sqlite3")
+    middleware = RateLimitMiddleware(_ok_app, max_requests=1, window=60, shared_state_path=path)
+    busy_ms = middleware.shared._conn.execute("PRAGMA busy_timeout").fetchone()[0]
+    assert busy_ms <= 10
+
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # another worker holding the write lock
+    try:
+        assert [_request(middleware) for _ in range(3)] == [200, 200, 200]
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert [_request(middleware) for _ in range(2)] == [200, 429]
@@ -1,19 +1,216 @@
+import asyncio
 import os
+import threading
+import time
 
+import numpy as np
 import pytest
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.documents import Document
 
+from config.settings import settings
+from services import retriever as retriever_module
+from services.local_index import LocalVectorIndex
 from services.retriever import MultiNamespaceRetriever
 
-
-pytestmark = pytest.mark.skipif(
+requires_credentials = pytest.mark.skipif(
     not os.getenv("PINECONE_API_KEY") or not os.getenv("OPENAI_API_KEY"),
     reason="Integration test requires Pinecone and OpenAI credentials",
 )
 
 
+@requires_credentials
 def test_retriever_builds_vectorstores():
+    from langchain_openai import OpenAIEmbeddings
+
     embeddings = OpenAIEmbeddings()
-    retriever = MultiNamespaceRetriever(["default"], embeddings)
+    retriever = MultiNamespaceRetriever(["default"], embeddings, backend="pinecone")
     assert "default" in retriever.vectorstores
 
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [1.0, 0.0, 0.0]
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        return [1.0, 0.0, 0.0]
+
+    async def aembed_documents(self, texts):
+        self.calls += 1
+        return [[1.0, 0.0, 0.0] for _ in texts]
+
+
+class SlowStore:
+    """Stand-in vector store whose searches sleep (or hang until released)."""
+
+    def __init__(self, name, delay=0.0, error=None, release=None, barrier=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.release = release
+        self.barrier = barrier
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def similarity_search_by_vector_with_score(self, vector, k=4):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.release is not None:
+                self.release.wait(5)
+            if self.barrier is not None:
+                self.barrier.wait(5)
+            time.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return [
+                (Document(id=f"{self.name}-{i}", page_content=f"{self.name} chunk {i}"), 0.9 - i / 10)
+                for i in range(k)
+            ]
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _retriever(tmp_path, stores, embeddings=None, timeout=1.0):
+    retriever = MultiNamespaceRetriever(
+        list(stores),
+        embeddings or CountingEmbeddings(),
+        backend="local",
+        index_dir=str(tmp_path / "index"),
+        lexical_dir=str(tmp_path / "lexical"),
+    )
+    retriever.vectorstores = dict(stores)
+    retriever.namespace_timeout = timeout
+    return retriever
+
+
+def test_fan_out_searches_namespaces_concurrently(tmp_path):
+    # Each search waits until the other has started, so a sequential
+    # fan-out would time out and skip a namespace.
+    barrier = threading.Barrier(2)
+    stores = {"a": SlowStore("a", barrier=barrier), "b": SlowStore("b", barrier=barrier)}
+    retriever = _retriever(tmp_path, stores)
+
+    retrieval = asyncio.run(retriever.aretrieve("tcp", top_k=4))
+    assert not barrier.broken
+    assert not retrieval.partial
+    assert {doc.metadata["source_namespace"] for doc in retrieval.documents} == {"a", "b"}
+
+
+def test_slow_namespace_is_skipped_and_flagged(tmp_path):
+    release = threading.Event()
+    stores = {"a": SlowStore("a"), "b": SlowStore("b", release=release)}
+    retriever = _retriever(tmp_path, stores, timeout=0.1)
+    try:
+        retrieval = asyncio.run(retriever.aretrieve("tcp", top_k=3))
+    finally:
+        release.set()
+    assert retrieval.skipped_namespaces == ["b"]
+    assert [doc.id for doc in retrieval.documents] == ["a-0", "a-1", "a-2"]
+
+
+def test_single_namespace_errors_propagate(tmp_path):
+    stores = {"a": SlowStore("a"), "b": SlowStore("b", error=RuntimeError("pinecone down"))}
+    retriever = _retriever(tmp_path, stores)
+    with pytest.raises(RuntimeError, match="pinecone down"):
+        asyncio.run(retriever.aget_documents("tcp", namespace="b"))
+    assert stores["a"].calls == 0
+
+
+def test_timed_out_searches_keep_their_slot(tmp_path):
+    release = threading.Event()
+    store = SlowStore("a", release=release)
+    retriever = _retriever(tmp_path, {"a": store}, timeout=0.05)
+    retriever.max_concurrency = 1
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(asyncio.TimeoutError):
+                await retriever.aget_documents("tcp", namespace="a")
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
+    # The first search hung past its timeout; the later ones timed out
+    # waiting for its slot instead of starting more threads.
+    assert (store.calls, store.max_active) == (1, 1)
+
+
+def _local_store(docs):
+    store = LocalVectorIndex(3)
+    ids, vectors, texts = zip(*docs)
+    store.add(list(ids), list(vectors), list(texts), [{} for _ in docs])
+    return store
+
+
+def test_mmr_candidates_keep_their_own_vectors_after_dedupe(tmp_path, monkeypatch):
+    # Both namespaces hold the same chunk text under different vectors; the
+    # copy from "b" scores higher, so it must survive with b's vector.
+    stores = {
+        "a": _local_store(
+            [("a-dup", [0.8, 0.6, 0.0], "shared chunk"), ("a-1", [0.6, 0.0, 0.8], "only in a")]
+        ),
+        "b": _local_store(
+            [("b-dup", [0.9, 0.0, 0.44], "shared chunk"), ("b-1", [0.0, 1.0, 0.0], "only in b")]
+        ),
+    }
+    retriever = _retriever(tmp_path, stores)
+    seen = []
+
+    def keep_order(query, embeddings, k, lambda_mult=0.5):
+        seen.append(np.asarray(embeddings))
+        return np.arange(min(k, len(embeddings)))
+
+    monkeypatch.setattr(retriever_module, "maximal_marginal_relevance", keep_order)
+    retrieval = asyncio.run(retriever.aretrieve("tcp", top_k=10, mmr_lambda=0.5, fetch_k=10))
+
+    docs = retrieval.documents
+    assert sorted(doc.id for doc in docs) == ["a-1", "b-1", "b-dup"]
+    for doc, vector in zip(docs, seen[0]):
+        store = stores[doc.metadata["source_namespace"]]
+        assert doc.id.startswith(doc.metadata["source_namespace"] + "-")
+        assert np.allclose(vector, store.vectors[store.ids.index(doc.id)])
+
+
+def test_mmr_retrieval_prefers_diverse_chunks(tmp_path):
+    stores = {
+        "a": _local_store(
+            [
+                ("a-0", [1.0, 0.05, 0.0], "tcp handshake"),
+                ("a-1", [1.0, 0.06, 0.0], "tcp handshake, again"),
+            ]
+        ),
+        "b": _local_store([("b-0", [0.7, 0.0, 0.7], "udp datagrams")]),
+    }
+    retriever = _retriever(tmp_path, stores)
+    relevance = asyncio.run(retriever.aretrieve("tcp", top_k=2, mmr_lambda=1.0, fetch_k=5))
+    diverse = asyncio.run(retriever.aretrieve("tcp", top_k=2, mmr_lambda=0.3, fetch_k=5))
+    assert {doc.id for doc in relevance.documents} == {"a-0", "a-1"}
+    assert {doc.id for doc in diverse.documents} == {"a-0", "b-0"}
+
+
+def test_fan_out_embeds_once_and_repeats_skip_the_embeddings_call(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "memory")
+    embeddings = CountingEmbeddings()
+    stores = {"a": SlowStore("a"), "b": SlowStore("b")}
+    retriever = _retriever(tmp_path, stores, embeddings=embeddings)
+
+    async def run():
+        await retriever.aget_documents("What is TCP?")
+        await retriever.aget_documents("What is TCP?  ")
+        await retriever.aembed_queries(["What is TCP?", "What is UDP?"])
+
+    asyncio.run(run())
+    # One call for the first question, one batch for the new question only.
+    assert embeddings.calls == 2
+    assert stores["a"].calls == stores["b"].calls == 2
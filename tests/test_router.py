@@ -0,0 +1,74 @@
+import asyncio
+
+import numpy as np
+
+from services.router import (
+    CHITCHAT,
+    IN_DOMAIN,
+    INTENT_EXAMPLES,
+    OUT_OF_DOMAIN,
+    QueryRouter,
+    build_router,
+)
+
+
+def _unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+INTENTS = {
+    CHITCHAT: _unit(1, 0, 0, 0),
+    OUT_OF_DOMAIN: _unit(0, 1, 0, 0),
+    IN_DOMAIN: _unit(0, 0, 1, 1),
+}
+NAMESPACES = {"networking": _unit(0, 0, 1, 0), "dsa": _unit(0, 0, 0, 1)}
+
+
+def test_short_circuits_only_with_a_clear_margin():
+    router = QueryRouter(INTENTS, margin=0.05)
+    assert router.route(_unit(1, 0.1, 0.1, 0.1)).intent == CHITCHAT
+    assert router.route(_unit(0.1, 1, 0.1, 0)).intent == OUT_OF_DOMAIN
+    # Nearest to chit-chat, but only just: still answered from the index.
+    assert router.route(_unit(0.75, 0, 0.5, 0.5)).intent == IN_DOMAIN
+
+
+def test_in_domain_queries_pick_the_nearest_namespace():
+    router = QueryRouter(INTENTS, NAMESPACES, namespace_margin=0.05)
+    assert router.route(_unit(0, 0, 1, 0.2)).namespace == "networking"
+    assert router.route(_unit(0, 0, 0.2, 1)).namespace == "dsa"
+    assert router.route(_unit(0, 0, 1, 1)).namespace is None  # too close to call
+
+
+class _FakeRetriever:
+    vectorstores = {"networking": None, "dsa": None}
+
+    def __init__(self, centroids):
+        self.centroids = centroids
+        self.batches = []
+
+    async def aembed_queries(self, texts):
+        self.batches.append(list(texts))
+        intent_of = {text: intent for intent, examples in INTENT_EXAMPLES.items() for text in examples}
+        return [INTENTS[intent_of[text]].tolist() for text in texts]
+
+    async def namespace_centroids(self, sample_size):
+        return self.centroids
+
+
+def test_build_router_embeds_examples_in_one_batch():
+    retriever = _FakeRetriever(NAMESPACES)
+    router = asyncio.run(build_router(retriever))
+    assert len(retriever.batches) == 1
+    assert router.route(_unit(1, 0, 0, 0)).intent == CHITCHAT
+    assert router.route(_unit(0, 0, 1, 0.2)).namespace == "networking"
+
+
+def test_build_router_fans_out_when_a_namespace_has_no_centroid():
+    router = asyncio.run(build_router(_FakeRetriever({"networking": NAMESPACES["networking"]})))
+    assert router.route(_unit(0, 0, 1, 0.2)).namespace is None
+
+
+def test_router_is_opt_in(fake_service):
+    asyncio.run(fake_service.load_router())
+    assert fake_service.router is None
@@ -0,0 +1,31 @@
+from utils.cache import LRUCache
+from utils.semantic_cache import SemanticCache
+
+
+def test_semantic_cache_hits_similar_query_in_same_namespace():
+    cache = LRUCache(max_size=10)
+    semantic = SemanticCache(cache, threshold=0.9)
+    cache.set("ns:What is TCP?", {"answer": "tcp"})
+    semantic.set("ns", "ns:What is TCP?", [1.0, 0.0, 0.1])
+
+    assert semantic.get("ns", [0.98, 0.0, 0.12]) == {"answer": "tcp"}
+    assert semantic.get("other", [0.98, 0.0, 0.12]) is None
+    assert semantic.get("ns", [0.0, 1.0, 0.0]) is None
+
+
+def test_semantic_cache_drops_entries_missing_from_backing_cache():
+    cache = LRUCache(max_size=10)
+    semantic = SemanticCache(cache, threshold=0.9)
+    semantic.set("ns", "ns:gone", [1.0, 0.0])
+    assert semantic.get("ns", [1.0, 0.0]) is None
+    assert semantic.stats()["entries"] == 0
+
+
+def test_semantic_cache_replaces_oldest_when_full():
+    cache = LRUCache(max_size=10)
+    semantic = SemanticCache(cache, threshold=0.99, max_entries=2)
+    for i, vector in enumerate([[1.0, 0.0], [0.0, 1.0], [-1.0, 0.0]]):
+        cache.set(f"k{i}", i)
+        semantic.set("ns", f"k{i}", vector)
+    assert semantic.get("ns", [1.0, 0.0]) is None
+    assert semantic.get("ns", [-1.0, 0.0]) == 2
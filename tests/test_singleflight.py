@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+def test_concurrent_streams_share_one_producer():
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield i
+
+    async def run():
+        flight = SingleFlight()
+        first = asyncio.create_task(_collect(flight.stream("k", produce)))
+        await asyncio.sleep(0.015)
+        # Attaches mid-stream but still sees every event from the start.
+        second = await _collect(flight.stream("k", produce))
+        return await first, second, flight
+
+    first, second, flight = asyncio.run(run())
+    assert first == second == [0, 1, 2]
+    assert len(calls) == 1
+    assert flight.inflight == {}
+
+
+def test_producer_errors_reach_every_subscriber():
+    async def produce():
+        yield "partial"
+        raise RuntimeError("upstream failed")
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(
+            _collect(flight.stream("k", produce)),
+            _collect(flight.stream("k", produce)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_producer_is_cancelled_when_all_subscribers_leave():
+    async def run():
+        state = {"cancelled": False}
+
+        async def produce():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield "token"
+            except asyncio.CancelledError:
+                state["cancelled"] = True
+                raise
+
+        flight = SingleFlight()
+        stream = flight.stream("k", produce)
+        assert await stream.__anext__() == "token"
+        await stream.aclose()
+        await asyncio.sleep(0.02)
+        return state["cancelled"], flight
+
+    was_cancelled, flight = asyncio.run(run())
+    assert was_cancelled
+    assert flight.inflight == {}
+
+
+def test_late_subscriber_keeps_the_stream_alive_before_it_starts():
+    async def produce():
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield i
+
+    async def run():
+        flight = SingleFlight()
+        first = flight.stream("k", produce)
+        assert await first.__anext__() == 0
+        # Handed out while the first subscriber is active, not yet iterated.
+        second = flight.stream("k", produce)
+        await first.aclose()
+        return await _collect(second)
+
+    assert asyncio.run(run()) == [0, 1, 2]
+
+
+def test_cancelled_producer_is_an_error_for_remaining_subscribers():
+    async def produce():
+        yield 0
+        await asyncio.sleep(10)
+        yield 1
+
+    async def run():
+        flight = SingleFlight()
+        stream = flight.stream("k", produce)
+        broadcast = flight.inflight["k"]
+        assert await stream.__anext__() == 0
+        broadcast._task.cancel()
+        with pytest.raises(RuntimeError, match="cancelled"):
+            await stream.__anext__()
+
+    asyncio.run(run())
@@ -0,0 +1,29 @@
+import json
+import os
+import subprocess
+import sys
+
+# Importing the app must stay cheap: gunicorn pays it for every worker and
+# tests pay it on every run. Generous next to the ~0.75s it takes today.
+IMPORT_BUDGET_SECONDS = 2.0
+
+_HEAVY_MODULES = ("langchain_openai", "openai", "pinecone", "markdown", "tiktoken")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (_HEAVY_MODULES,)
+
+
+def test_app_imports_fast_without_credentials():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("OPENAI_", "PINECONE_"))}
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=root, env=env, capture_output=True, text=True, check=True
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert result["loaded"] == []
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,46 @@
+import asyncio
+import json
+
+from services.warmup import load_questions, warm_up
+
+
+def test_load_questions_ranks_log_entries_by_frequency(tmp_path):
+    log = tmp_path / "queries.jsonl"
+    lines = [
+        {"query": "What is UDP?"},
+        {"query": "What is TCP?", "namespace": "networking-pdf"},
+        {"question": "What is TCP?", "namespace": "networking-pdf"},
+    ]
+    log.write_text("\n".join(json.dumps(line) for line in lines) + "\n")
+    assert load_questions(str(log)) == [
+        ("networking-pdf", "What is TCP?"),
+        ("default", "What is UDP?"),
+    ]
+    assert load_questions(str(log), limit=1) == [("networking-pdf", "What is TCP?")]
+
+
+def test_load_questions_reads_plain_lists(tmp_path):
+    path = tmp_path / "top.txt"
+    path.write_text("# most asked\nWhat is TCP?\n\nWhat is a heap?\n")
+    assert load_questions(str(path)) == [("default", "What is TCP?"), ("default", "What is a heap?")]
+
+
+class _FakeService:
+    def __init__(self):
+        self.batches = []
+
+    async def query_batch(self, questions, namespace="default", max_concurrency=None):
+        self.batches.append((namespace, list(questions)))
+        for i, question in enumerate(questions):
+            if question == "boom":
+                yield {"indices": [i], "error": "failed"}
+            else:
+                yield {"indices": [i], "answer": question.upper()}
+
+
+def test_warm_up_batches_per_namespace_and_counts_failures():
+    service = _FakeService()
+    questions = [("a", "q1"), ("b", "q2"), ("a", "boom")]
+    stats = asyncio.run(warm_up(service, questions, max_concurrency=2))
+    assert service.batches == [("a", ["q1", "boom"]), ("b", ["q2"])]
+    assert (stats.questions, stats.answered, stats.failed) == (3, 2, 1)
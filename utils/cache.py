@@ -1,40 +1,152 @@
+import os
+import sys
 import time
-from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
 
 
-class SimpleCache:
-    """Tiny in-memory cache with TTL, no external dependency."""
+def approximate_size(value: Any) -> int:
+    """Rough deep size in bytes of JSON-like values (str, bytes, dict, list)."""
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            approximate_size(k) + approximate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(approximate_size(v) for v in value)
+    return sys.getsizeof(value)
 
-    def __init__(self, max_size: int = 128, ttl_seconds: int = 600):
+
+class LRUCache:
+    """In-memory LRU cache with optional TTL and byte budget, O(1) get/set.
+
+    Entries live in an OrderedDict kept in recency order. Because every entry
+    shares the same TTL, a second OrderedDict in write order is also in expiry
+    order, so expired entries are dropped lazily from its head instead of by
+    scanning the whole store.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = approximate_size,
+    ):
         self.max_size = max_size
         self.ttl = ttl_seconds
-        self.store: Dict[str, Tuple[float, Any]] = {}
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        # key -> (expires_at, size, value)
+        self.store: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._expiry: "OrderedDict[str, float]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self.store)
 
-    def _evict_expired(self):
-        now = time.time()
-        keys = [k for k, (ts, _) in self.store.items() if now - ts > self.ttl]
-        for k in keys:
-            self.store.pop(k, None)
+    def _remove(self, key: str):
+        _, size, _ = self.store.pop(key)
+        self._expiry.pop(key, None)
+        self.current_bytes -= size
+
+    def _evict_expired(self, now: float):
+        while self._expiry:
+            key, expires_at = next(iter(self._expiry.items()))
+            if expires_at > now:
+                break
+            self._remove(key)
+            self.expirations += 1
 
     def _evict_if_needed(self):
-        if len(self.store) > self.max_size:
-            # drop oldest entry
-            oldest_key = min(self.store.items(), key=lambda kv: kv[1][0])[0]
-            self.store.pop(oldest_key, None)
+        while self.store and (
+            len(self.store) > self.max_size
+            or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+        ):
+            key = next(iter(self.store))
+            self._remove(key)
+            self.evictions += 1
 
     def get(self, key: str) -> Optional[Any]:
-        self._evict_expired()
         item = self.store.get(key)
-        if not item:
+        if item is None:
+            self.misses += 1
             return None
-        ts, value = item
-        if time.time() - ts > self.ttl:
-            self.store.pop(key, None)
+        expires_at, _, value = item
+        if time.monotonic() >= expires_at:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
             return None
+        self.store.move_to_end(key)
+        self.hits += 1
         return value
 
     def set(self, key: str, value: Any):
-        self._evict_expired()
-        self.store[key] = (time.time(), value)
+        now = time.monotonic()
+        if key in self.store:
+            self._remove(key)
+        self._evict_expired(now)
+
+        expires_at = now + self.ttl if self.ttl is not None else float("inf")
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        self.store[key] = (expires_at, size, value)
+        if self.ttl is not None:
+            self._expiry[key] = expires_at
+        self.current_bytes += size
         self._evict_if_needed()
 
+    def delete(self, key: str):
+        if key in self.store:
+            self._remove(key)
+
+    def clear(self):
+        self.store.clear()
+        self._expiry.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.store),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# Backward-compatible name for the original TTL cache.
+SimpleCache = LRUCache
+
+
+def build_cache(
+    backend: str,
+    name: str,
+    max_size: int,
+    ttl_seconds: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    directory: str = ".cache",
+):
+    """Create the cache named ``name`` on the configured backend.
+
+    ``memory`` keeps a per-process LRUCache; ``disk`` uses a SQLite file under
+    ``directory`` that all workers on the host share.
+    """
+    if backend == "memory":
+        return LRUCache(max_size=max_size, ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+    if backend == "disk":
+        from utils.disk_cache import DiskCache
+
+        return DiskCache(
+            os.path.join(directory, f"{name}.sqlite3"),
+            max_size=max_size,
+            ttl_seconds=ttl_seconds,
+            max_bytes=max_bytes,
+        )
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import zstandard
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class DiskCache:
+    """SQLite-backed cache shared by every worker process on a host.
+
+    Exposes the same get/set interface as utils.cache.LRUCache. The database
+    runs in WAL mode so readers never block the single writer, values are
+    stored as zstd-compressed JSON, and entries survive restarts until their
+    TTL passes. Expired rows are skipped on read and purged in batches on
+    write, together with trimming to the entry and byte budgets.
+
+    Calls run on the event loop, so the busy timeout is short. A database
+    error or a corrupt entry is a miss on ``get``, and a failed write is a
+    no-op. A locked or broken cache file costs cache hits, never requests.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int = 10_000,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        prune_interval: int = 256,
+        compression_level: int = 3,
+        busy_timeout: float = 0.05,
+    ):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._compressor = zstandard.ZstdCompressor(level=compression_level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, timeout=busy_timeout, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, expires_at REAL, written_at REAL NOT NULL, value BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_written ON entries (written_at)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT expires_at, value FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning("Disk cache read failed, treating as a miss: %s", e)
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            expires_at, blob = row
+            if expires_at is not None and time.time() >= expires_at:
+                # Left for _prune: deleting here would put a write on the read path.
+                self.misses += 1
+                return None
+            try:
+                value = json.loads(self._decompressor.decompress(blob))
+            except (zstandard.ZstdError, ValueError) as e:
+                logger.warning("Disk cache entry is corrupt, treating as a miss: %s", e)
+                self.misses += 1
+                return None
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        blob = json.dumps(value, default=str).encode("utf-8")
+        with self._lock:
+            blob = self._compressor.compress(blob)
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, expires_at, written_at, value) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, expires_at, now, blob),
+                )
+                self._writes += 1
+                if self._writes % self.prune_interval == 0:
+                    self._prune(now)
+            except sqlite3.Error as e:
+                logger.warning("Disk cache write failed, skipping: %s", e)
+
+    def delete(self, key: str):
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            except sqlite3.Error as e:
+                logger.warning("Disk cache delete failed, skipping: %s", e)
+
+    def clear(self):
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM entries")
+            except sqlite3.Error as e:
+                logger.warning("Disk cache clear failed, skipping: %s", e)
+
+    def _prune(self, now: float):
+        cur = self._conn.execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        )
+        self.expirations += cur.rowcount
+
+        count, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM entries"
+        ).fetchone()
+        excess = max(0, count - self.max_size)
+        if self.max_bytes is not None and total_bytes > self.max_bytes and count:
+            # Drop the oldest writes, estimating from the average entry size.
+            average = total_bytes / count
+            excess = max(excess, int((total_bytes - self.max_bytes) / average) + 1)
+        if excess:
+            cur = self._conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY written_at, rowid LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM entries"
+            ).fetchone()
+        return {
+            "entries": count,
+            "bytes": total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -1,15 +1,305 @@
+"""In-process metrics with Prometheus text exposition.
+
+Metrics are declared once at import time and their labelled series are
+resolved up front, so recording on the hot path is a few attribute updates:
+no locks (updates happen on the event loop thread) and no allocation.
+
+Each gunicorn worker has its own registry. When METRICS_MULTIPROC_DIR is set,
+every worker periodically writes a JSON snapshot to ``<dir>/<pid>.json``
+and ``/metrics`` sums the snapshots of all workers. Counters and histograms
+from exited workers are kept so totals never go backwards; gauges only count
+live processes.
+"""
+
+import asyncio
+import glob
+import json
+import os
 import time
-from contextlib import contextmanager
-from typing import Generator
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from cache hits to slow generations.
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class GaugeValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Metric:
+    """A metric family: one series per combination of label values."""
+
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], object] = {}
+
+    def _new_value(self):
+        if self.kind == "counter":
+            return CounterValue()
+        if self.kind == "gauge":
+            return GaugeValue()
+        return HistogramValue(self.buckets)
+
+    def labels(self, *values: str):
+        """Return the series for ``values``; resolve once and keep the result."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = self._new_value()
+        return series
+
+    def snapshot(self) -> List:
+        out = []
+        for values, series in self.series.items():
+            if self.kind == "histogram":
+                out.append([list(values), {"counts": list(series.counts), "sum": series.sum}])
+            else:
+                out.append([list(values), series.value])
+        return out
+
+
+# The process-wide registry. Every function below takes an optional
+# ``registry`` so tests can declare throwaway metrics in a private dict.
+_registry: Dict[str, Metric] = {}
+
+
+def _register(metric: Metric, registry: Optional[Dict[str, Metric]] = None) -> Metric:
+    registry = _registry if registry is None else registry
+    if metric.name in registry:
+        raise ValueError(f"Metric {metric.name} already registered")
+    registry[metric.name] = metric
+    return metric
+
 
+def counter(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    registry: Optional[Dict[str, Metric]] = None,
+) -> Metric:
+    return _register(Metric("counter", name, documentation, labelnames), registry)
 
-@contextmanager
-def timed(metric_name: str) -> Generator[float, None, None]:
-    start = time.perf_counter()
+
+def gauge(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    registry: Optional[Dict[str, Metric]] = None,
+) -> Metric:
+    return _register(Metric("gauge", name, documentation, labelnames), registry)
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+    registry: Optional[Dict[str, Metric]] = None,
+) -> Metric:
+    return _register(Metric("histogram", name, documentation, labelnames, buckets), registry)
+
+
+# --- Application metrics -------------------------------------------------
+
+STAGE_SECONDS = histogram(
+    "rag_stage_seconds",
+    "Latency of each query stage: embed, search (one namespace), lexical, mmr, retrieve, "
+    "ttft (time to first token), generate, total.",
+    ["stage"],
+)
+CACHE_REQUESTS = counter(
+    "rag_cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"]
+)
+LLM_TOKENS = counter(
+    "rag_llm_tokens_total",
+    "LLM tokens: in = packed context plus question, out = streamed chunks.",
+    ["direction"],
+)
+NAMESPACE_ERRORS = counter(
+    "rag_namespace_search_errors_total", "Namespace searches that failed or timed out."
+)
+ROUTES = counter(
+    "rag_routes_total",
+    "Query routing decisions: greeting, chitchat, out_of_domain, namespace (one "
+    "namespace searched) or fanout.",
+    ["route"],
+)
+GENERATIONS_CANCELLED = counter(
+    "rag_generations_cancelled_total", "Generations cancelled after every client went away."
+)
+STREAMS_ABANDONED = counter(
+    "http_streams_abandoned_total", "Streaming responses that ended before completion."
+)
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by status class.", ["status"])
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "HTTP requests currently being served.")
+RATE_LIMITED = counter("rate_limit_rejections_total", "Requests rejected with 429.")
+
+
+# --- Multi-process aggregation -------------------------------------------
+
+def write_snapshot(directory: str, registry: Optional[Dict[str, Metric]] = None):
+    """Atomically write this process's metrics to ``<directory>/<pid>.json``."""
+    registry = _registry if registry is None else registry
+    os.makedirs(directory, exist_ok=True)
+    pid = os.getpid()
+    data = {"pid": pid, "written_at": time.time()}
+    data["metrics"] = {name: metric.snapshot() for name, metric in registry.items()}
+    path = os.path.join(directory, f"{pid}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid: int) -> bool:
     try:
-        yield start
-    finally:
-        duration_ms = (time.perf_counter() - start) * 1000
-        # Placeholder for integrating with metrics backend
-        print(f"{metric_name} took {duration_ms:.2f} ms")
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_snapshots(directory: str) -> Iterable[Dict]:
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                yield json.load(f)
+        except (OSError, ValueError):
+            continue  # Being replaced by its worker; picked up next scrape.
 
+
+def collect(
+    directory: Optional[str] = None, registry: Optional[Dict[str, Metric]] = None
+) -> Dict[str, Dict[Tuple[str, ...], object]]:
+    """Sum series across processes. Returns name -> label values -> value."""
+    registry = _registry if registry is None else registry
+    if directory:
+        write_snapshot(directory, registry)
+        snapshots = list(_read_snapshots(directory))
+    else:
+        snapshots = [{"pid": os.getpid(), "metrics": {n: m.snapshot() for n, m in registry.items()}}]
+
+    totals: Dict[str, Dict[Tuple[str, ...], object]] = {name: {} for name in registry}
+    for snapshot in snapshots:
+        alive = snapshot["pid"] == os.getpid() or _pid_alive(snapshot["pid"])
+        for name, series in snapshot["metrics"].items():
+            metric = registry.get(name)
+            if metric is None or (metric.kind == "gauge" and not alive):
+                continue
+            merged = totals[name]
+            for values, value in series:
+                key = tuple(values)
+                if metric.kind == "histogram":
+                    current = merged.get(key)
+                    if current is None:
+                        merged[key] = {"counts": list(value["counts"]), "sum": value["sum"]}
+                    else:
+                        current["counts"] = [a + b for a, b in zip(current["counts"], value["counts"])]
+                        current["sum"] += value["sum"]
+                else:
+                    merged[key] = merged.get(key, 0.0) + value
+    return totals
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render(
+    directory: Optional[str] = None, registry: Optional[Dict[str, Metric]] = None
+) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    registry = _registry if registry is None else registry
+    lines: List[str] = []
+    for name, series in collect(directory, registry).items():
+        metric = registry[name]
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for values, value in sorted(series.items()):
+            if metric.kind != "histogram":
+                labels = _format_labels(metric.labelnames, values)
+                lines.append(f"{name}{labels} {_format_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float("inf"),), value["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_number(bound)
+                labels = _format_labels(metric.labelnames, values, f'le="{le}"')
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _format_labels(metric.labelnames, values)
+            lines.append(f"{name}_sum{labels} {_format_number(value['sum'])}")
+            lines.append(f"{name}_count{labels} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+async def flush_periodically(directory: str, interval: float):
+    """Keep this worker's snapshot fresh for scrapes served by other workers."""
+    try:
+        while True:
+            write_snapshot(directory)
+            await asyncio.sleep(interval)
+    finally:
+        write_snapshot(directory)
@@ -0,0 +1,111 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class _NamespaceVectors:
+    """Growable matrix of unit-normalised query embeddings for one namespace."""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+        self.seq = np.empty(capacity, dtype=np.int64)
+        self.keys: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def put(self, key: str, vector: np.ndarray, seq: int):
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == self.matrix.shape[0]:
+                self._grow()
+            self.keys.append(key)
+            self.rows[key] = row
+        self.matrix[row] = vector
+        self.seq[row] = seq
+
+    def remove_row(self, row: int):
+        # Swap the last row into the hole so the live rows stay contiguous.
+        last = len(self.keys) - 1
+        key = self.keys[row]
+        if row != last:
+            moved = self.keys[last]
+            self.matrix[row] = self.matrix[last]
+            self.seq[row] = self.seq[last]
+            self.keys[row] = moved
+            self.rows[moved] = row
+        self.keys.pop()
+        del self.rows[key]
+
+    def _grow(self):
+        capacity = self.matrix.shape[0] * 2
+        matrix = np.empty((capacity, self.matrix.shape[1]), dtype=np.float32)
+        matrix[: len(self.keys)] = self.matrix[: len(self.keys)]
+        seq = np.empty(capacity, dtype=np.int64)
+        seq[: len(self.keys)] = self.seq[: len(self.keys)]
+        self.matrix, self.seq = matrix, seq
+
+
+class SemanticCache:
+    """Serve cached answers for queries whose embeddings are close enough.
+
+    Only the query embeddings and cache keys are held here; the answers
+    themselves stay in the backing cache, so they expire and are evicted by
+    its rules. Lookup is a single matrix-vector product per namespace.
+    """
+
+    def __init__(self, cache, threshold: float = 0.93, max_entries: int = 4096):
+        self.cache = cache
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.namespaces: Dict[str, _NamespaceVectors] = {}
+        self._seq = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(arr))
+        return arr / norm if norm else arr
+
+    def get(self, namespace: str, vector: Sequence[float]) -> Optional[Any]:
+        vectors = self.namespaces.get(namespace)
+        if not vectors:
+            self.misses += 1
+            return None
+
+        query = self._normalize(vector)
+        scores = vectors.matrix[: len(vectors)] @ query
+        row = int(np.argmax(scores))
+        if scores[row] < self.threshold:
+            self.misses += 1
+            return None
+
+        value = self.cache.get(vectors.keys[row])
+        if value is None:
+            # The answer expired or was evicted from the backing cache.
+            vectors.remove_row(row)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, namespace: str, key: str, vector: Sequence[float]):
+        query = self._normalize(vector)
+        vectors = self.namespaces.get(namespace)
+        if vectors is None:
+            vectors = self.namespaces[namespace] = _NamespaceVectors(dim=query.shape[0])
+        if key not in vectors.rows and len(vectors) >= self.max_entries:
+            vectors.remove_row(int(np.argmin(vectors.seq[: len(vectors)])))
+        self._seq += 1
+        vectors.put(key, query, self._seq)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": sum(len(v) for v in self.namespaces.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
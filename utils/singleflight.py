@@ -0,0 +1,96 @@
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+
+class StreamBroadcast:
+    """Run one async event stream and replay it to any number of subscribers.
+
+    Every event is kept in a replay buffer, so a subscriber that attaches late
+    still receives the stream from the start. A subscriber counts from the
+    moment ``subscribe`` returns, not from its first iteration, so a
+    subscription handed out but not yet started keeps the producer alive.
+    When the last subscriber leaves before the stream finishes, the producer
+    task is cancelled.
+    """
+
+    def __init__(
+        self, source: AsyncIterator[Any], on_close: Optional[Callable[[], None]] = None
+    ):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._on_close = on_close
+        self._changed = asyncio.Event()
+        self._task = asyncio.create_task(self._run(source))
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _close(self):
+        if self._on_close is not None:
+            self._on_close()
+            self._on_close = None
+
+    async def _run(self, source: AsyncIterator[Any]):
+        try:
+            async for event in source:
+                self.events.append(event)
+                self._notify()
+        except asyncio.CancelledError:
+            # Anyone still replaying must not mistake the truncated buffer
+            # for a finished stream.
+            self.error = RuntimeError("stream was cancelled before it finished")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._close()
+            self._notify()
+
+    def subscribe(self) -> AsyncIterator[Any]:
+        self.subscribers += 1
+        return self._replay()
+
+    async def _replay(self) -> AsyncIterator[Any]:
+        position = 0
+        try:
+            while True:
+                changed = self._changed
+                while position < len(self.events):
+                    yield self.events[position]
+                    position += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                # Nobody is listening any more; stop paying for generation and
+                # make sure new requests start a fresh stream.
+                self._close()
+                self._task.cancel()
+
+
+class SingleFlight:
+    """Coalesce concurrent streams that share a key into one producer."""
+
+    def __init__(self):
+        self.inflight: Dict[str, StreamBroadcast] = {}
+
+    def stream(
+        self, key: str, factory: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        broadcast = self.inflight.get(key)
+        if broadcast is None:
+            broadcast = StreamBroadcast(factory(), on_close=lambda: self._release(key, broadcast))
+            self.inflight[key] = broadcast
+        return broadcast.subscribe()
+
+    def _release(self, key: str, broadcast: StreamBroadcast):
+        if self.inflight.get(key) is broadcast:
+            del self.inflight[key]